@@ -1,5 +1,7 @@
 import pandas as pd
 
+import portfolio
+
 df = pd.read_csv('borrowers.csv')
 
 print("=" * 50)
@@ -24,60 +26,49 @@ print("\n" + "=" * 50)
 print("RISK SCORE SIMULATION")
 print("=" * 50)
 
-# Calculate risk scores for all borrowers
-risk_scores = []
-for _, row in df.iterrows():
-    fico = row['fico_range_high']
-    income = row['annual_inc']
-    
-    base_score = 100 - (fico / 8.5)
-    if income > 80000:
-        base_score -= 15
-    
-    final_score = max(0, min(100, base_score))
-    risk_scores.append(final_score)
-
-df['calculated_risk_score'] = risk_scores
+# Score every borrower in one vectorized pass (same formula as the API)
+summary = portfolio.summarize_file('borrowers.csv', top_n=5).result()
+risk = summary['risk_score']
 
 print(f"\nRisk Score Statistics:")
-print(f"Minimum Risk: {df['calculated_risk_score'].min():.2f}")
-print(f"Maximum Risk: {df['calculated_risk_score'].max():.2f}")
-print(f"Mean Risk: {df['calculated_risk_score'].mean():.2f}")
+print(f"Minimum Risk: {risk['min']:.2f}")
+print(f"Maximum Risk: {risk['max']:.2f}")
+print(f"Mean Risk: {risk['mean']:.2f}")
 
 print("\nRisk Category Distribution:")
-df['risk_category'] = df['calculated_risk_score'].apply(
-    lambda x: 'Low' if x < 30 else ('Medium' if x < 60 else 'High')
-)
-print(df['risk_category'].value_counts())
+for name, tier in summary['tiers'].items():
+    print(f"{name:<7} {tier['count']}")
 
 print("\n" + "=" * 50)
 print("SAMPLE BORROWERS")
 print("=" * 50)
 
+columns = ['member_id', 'fico_range_high', 'annual_inc', 'loan_amnt', 'risk_score', 'risk_category']
+
 # Show worst cases (highest risk)
 print("\nTop 5 Highest Risk Borrowers:")
-worst = df.nlargest(5, 'calculated_risk_score')[['member_id', 'fico_range_high', 'annual_inc', 'loan_amnt', 'calculated_risk_score', 'risk_category']]
-print(worst.to_string(index=False))
+print(pd.DataFrame(summary['riskiest'], columns=columns).to_string(index=False))
 
 # Show best cases (lowest risk)
 print("\nTop 5 Lowest Risk Borrowers:")
-best = df.nsmallest(5, 'calculated_risk_score')[['member_id', 'fico_range_high', 'annual_inc', 'loan_amnt', 'calculated_risk_score', 'risk_category']]
-print(best.to_string(index=False))
+print(pd.DataFrame(summary['safest'], columns=columns).to_string(index=False))
 
 print("\n" + "=" * 50)
 print("CONCLUSION")
 print("=" * 50)
 
-high_risk_count = len(df[df['calculated_risk_score'] >= 60])
-medium_risk_count = len(df[(df['calculated_risk_score'] >= 30) & (df['calculated_risk_score'] < 60)])
-low_risk_count = len(df[df['calculated_risk_score'] < 30])
+total = summary['borrowers']
+low_risk_count = summary['tiers']['Low']['count']
+medium_risk_count = summary['tiers']['Medium']['count']
+high_risk_count = summary['tiers']['High']['count']
 
-print(f"\nTotal Borrowers: {len(df)}")
-print(f"Low Risk (< 30): {low_risk_count} ({low_risk_count/len(df)*100:.1f}%)")
-print(f"Medium Risk (30-60): {medium_risk_count} ({medium_risk_count/len(df)*100:.1f}%)")
-print(f"High Risk (>= 60): {high_risk_count} ({high_risk_count/len(df)*100:.1f}%)")
+print(f"\nTotal Borrowers: {total}")
+print(f"Low Risk (< 30): {low_risk_count} ({low_risk_count/total*100:.1f}%)")
+print(f"Medium Risk (30-60): {medium_risk_count} ({medium_risk_count/total*100:.1f}%)")
+print(f"High Risk (>= 60): {high_risk_count} ({high_risk_count/total*100:.1f}%)")
+print(f"Total Expected Credit Loss: ${summary['expected_credit_loss']['total']:,.2f}")
 
-if low_risk_count == len(df):
+if low_risk_count == total:
     print("\n⚠️ WARNING: ALL borrowers are LOW RISK!")
     print("This dataset contains only high-quality borrowers.")
     print("In real scenarios, you would have more risk diversity.")
@@ -1,40 +1,431 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
+import functools
+import hmac
 import logging
+import os
+import threading
+import time
+
+import coalescer
+import export
+import json_provider
+import log_config
+import metrics
+import portfolio
+import query_index
+import scoring
+import simulation
+import snapshot
+import sqlite_store
+from borrower_store import BorrowerStore
+from response_cache import ResponseCache
 
 app = Flask(__name__)
+# orjson-backed jsonify when available, numpy- and NaN-safe either way
+app.json = json_provider.FastJSONProvider(app)
 CORS(app)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging: queued, lazily formatted, optionally JSON (see log_config.py)
+log_config.setup_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('credit_api.access')
 
 # --- 1. THE DATA ---
-try:
-    # Try to load the CSV you made
-    df = pd.read_csv('borrowers.csv')
-    logger.info(f"Successfully loaded borrowers.csv with {len(df)} records")
-except Exception as e:
-    # Failsafe if CSV is missing - MOCK DATA
-    logger.warning(f"CSV not found ({e}), using Mock Data")
-    data = {
-        'member_id': [101, 102, 103], 
-        'annual_inc': [55000, 120000, 35000], 
-        'fico_range_high': [680, 790, 550],
-        'loan_amnt': [10000, 25000, 5000]
-    }
-    df = pd.DataFrame(data)
-
-# --- 2. THE ENDPOINTS ---
+CSV_FILE = os.environ.get('BORROWERS_CSV', 'borrowers.csv')
+SNAPSHOT_DIR = os.environ.get('BORROWERS_SNAPSHOT', snapshot.SNAPSHOT_DIR)
+# Fork-friendly store layout, shared by gunicorn workers (see gunicorn.conf.py)
+SHARED_DATASET = os.environ.get('SHARED_DATASET', '1') == '1'
+# 'memory' (snapshot or CSV, held in RAM) or 'sqlite' (on disk, see sqlite_store.py)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+DATABASE_FILE = os.environ.get('BORROWERS_DB', sqlite_store.DATABASE_FILE)
+
+def load_borrowers():
+    """Build the borrower store: snapshot, then CSV, then mock data"""
+    started = time.perf_counter()
+    loaded = _load_borrowers()
+    loaded.load_seconds = time.perf_counter() - started
+    logger.info("Borrower table uses %d bytes (%.1f per record)", loaded.nbytes, loaded.nbytes / max(len(loaded), 1))
+    return loaded
+
+def _load_borrowers():
+    if STORAGE_BACKEND == 'sqlite':
+        # Rows stay on disk; only hot rows are cached in each worker
+        loaded = sqlite_store.SqliteStore(
+            DATABASE_FILE, max_cached=int(os.environ.get('SQLITE_CACHE_SIZE', sqlite_store.CACHE_SIZE)))
+        loaded.source = DATABASE_FILE
+        logger.info("Opened database %s with %d records", DATABASE_FILE, len(loaded))
+        return loaded
+
+    if snapshot.exists(SNAPSHOT_DIR):
+        # Memory-mapped columns: no parsing, pages shared between workers
+        loaded = snapshot.load_store(SNAPSHOT_DIR)
+        loaded.source = SNAPSHOT_DIR
+        logger.info("Successfully loaded snapshot %s with %d records", SNAPSHOT_DIR, len(loaded))
+        if os.path.exists(CSV_FILE) and os.path.getmtime(CSV_FILE) > os.path.getmtime(
+                os.path.join(SNAPSHOT_DIR, snapshot.META_FILE)):
+            logger.warning("%s is newer than snapshot %s; run python snapshot.py to refresh it", CSV_FILE, SNAPSHOT_DIR)
+        return loaded
+    
+    try:
+        # Try to load the CSV you made
+        df = pd.read_csv(CSV_FILE, dtype={'loan_status': 'category'})
+        source = CSV_FILE
+        logger.info("Successfully loaded %s with %d records", CSV_FILE, len(df))
+    except Exception as e:
+        # Failsafe if CSV is missing - MOCK DATA
+        logger.warning("CSV not found (%s), using Mock Data", e)
+        data = {
+            'member_id': [101, 102, 103], 
+            'annual_inc': [55000, 120000, 35000], 
+            'fico_range_high': [680, 790, 550],
+            'loan_amnt': [10000, 25000, 5000]
+        }
+        df = pd.DataFrame(data)
+        source = "mock"
+    
+    # Index by member_id once at load time so lookups don't scan the table
+    loaded = BorrowerStore.from_frame(df, shared=SHARED_DATASET)
+    loaded.source = source
+    return loaded
+
+def dataset_fingerprint():
+    """(mtime, size) of each file load_borrowers reads; changes when data is rewritten"""
+    fingerprint = []
+    paths = (DATABASE_FILE,) if STORAGE_BACKEND == 'sqlite' else (os.path.join(SNAPSHOT_DIR, snapshot.META_FILE), CSV_FILE)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((stat.st_mtime, stat.st_size))
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+_reload_lock = threading.Lock()
+_loaded_fingerprint = dataset_fingerprint()
+store = load_borrowers()
+
+def reload_borrowers():
+    """Build a fresh store off to the side and swap it in
+
+    Rebinding the module-level name is atomic; handlers read `store` once,
+    so in-flight requests finish on the version they started with.
+    """
+    global store, _loaded_fingerprint
+    with _reload_lock:
+        fingerprint = dataset_fingerprint()
+        new_store = load_borrowers()
+        new_store.version = store.version + 1
+        store = new_store
+        _loaded_fingerprint = fingerprint
+    logger.info("Dataset reloaded: version %d, %d records from %s", new_store.version, len(new_store), new_store.source)
+    return new_store
+
+def _reload_quietly():
+    """reload_borrowers for background threads: failures keep the old store"""
+    try:
+        reload_borrowers()
+    except Exception as e:
+        logger.error("Dataset reload failed, keeping version %d: %s", store.version, e)
+
+def _watch_dataset(interval):
+    """Poll the data files; reload once a change has settled for one interval"""
+    previous = _loaded_fingerprint
+    while True:
+        time.sleep(interval)
+        current = dataset_fingerprint()
+        # Require two identical polls so a file still being written isn't loaded
+        if current != _loaded_fingerprint and current == previous:
+            _reload_quietly()
+        previous = current
+
+_watcher = None
+
+def start_dataset_watcher():
+    """Start the file watcher if DATASET_WATCH_INTERVAL (seconds) is set
+
+    Called per process (gunicorn's post_fork hook, or __main__) because
+    threads don't survive a fork.
+    """
+    global _watcher
+    interval = float(os.environ.get('DATASET_WATCH_INTERVAL', 0))
+    if interval <= 0 or _watcher is not None:
+        return
+    _watcher = threading.Thread(target=_watch_dataset, args=(interval,), daemon=True)
+    _watcher.start()
+    if STORAGE_BACKEND == 'sqlite':
+        logger.info("Watching %s for changes every %ss", DATABASE_FILE, interval)
+    else:
+        logger.info("Watching %s and %s for changes every %ss", SNAPSHOT_DIR, CSV_FILE, interval)
+
+# --- 2. METRICS ---
+REGISTRY = metrics.Registry()
+REQUEST_LATENCY = REGISTRY.histogram(
+    'credit_api_request_duration_seconds', 'Request latency by route', ['route', 'method'])
+REQUESTS = REGISTRY.counter(
+    'credit_api_requests_total', 'Requests by route and status code', ['route', 'method', 'status'])
+STAGE_LATENCY = REGISTRY.histogram(
+    'credit_api_stage_duration_seconds', 'Time spent in each handler stage', ['endpoint', 'stage'])
+VALIDATION_FAILURES = REGISTRY.counter(
+    'credit_api_validation_failures_total', 'Requests rejected with 400', ['route'])
+ERRORS = REGISTRY.counter(
+    'credit_api_errors_total', 'Requests that failed with a 5xx', ['route'])
+NOT_FOUND = REGISTRY.counter(
+    'credit_api_member_not_found_total', 'Lookups for unknown member_ids', ['endpoint'])
+BATCH_ITEM_ERRORS = REGISTRY.counter(
+    'credit_api_batch_item_errors_total', 'Invalid items inside batch requests', ['endpoint'])
+COALESCED_BATCH_SIZE = REGISTRY.histogram(
+    'credit_api_coalesced_batch_size', 'Single-item requests run per coalesced batch', ['endpoint'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+COALESCER_QUEUE_DELAY = REGISTRY.histogram(
+    'credit_api_coalescer_queue_seconds', 'Time a request waited for its coalesced batch', ['endpoint'])
+REGISTRY.gauge('credit_api_dataset_rows', 'Borrower records loaded',
+               function=lambda: len(store))
+REGISTRY.gauge('credit_api_dataset_version', 'Reload count of the borrower data',
+               function=lambda: store.version)
+REGISTRY.gauge('credit_api_dataset_bytes', 'Memory held by the borrower table columns (file size for sqlite)',
+               function=lambda: store.nbytes)
+REGISTRY.gauge('credit_api_dataset_load_seconds', 'Time taken to load the borrower data',
+               function=lambda: store.load_seconds)
+REGISTRY.gauge('credit_api_dataset_loaded_timestamp_seconds', 'When the borrower data was loaded',
+               function=lambda: store.loaded_at)
+REGISTRY.gauge('credit_api_response_cache_hits', 'Response cache hits since start',
+               function=lambda: response_cache.hits)
+REGISTRY.gauge('credit_api_response_cache_misses', 'Response cache misses since start',
+               function=lambda: response_cache.misses)
+
+def _stage(name):
+    """Time one stage of the current handler (parse, lookup, compute, serialize)"""
+    return STAGE_LATENCY.time(request.endpoint, name)
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        latency = time.perf_counter() - started
+        status = response.status_code
+        REQUEST_LATENCY.observe(latency, route, request.method)
+        REQUESTS.inc(route, request.method, str(status))
+        if status == 400:
+            VALIDATION_FAILURES.inc(route)
+        elif status >= 500:
+            ERRORS.inc(route)
+        # One structured line per request; failures are never sampled away
+        outcome = "ok" if status < 400 else "rejected" if status < 500 else "error"
+        access_logger.log(logging.INFO if status < 400 else logging.WARNING,
+                          "%s %s %d %.2fms", request.method, request.path, status, latency * 1000,
+                          extra={"route": route, "method": request.method, "status": status,
+                                 "latency_ms": round(latency * 1000, 3), "outcome": outcome})
+    return response
+
+# --- 3. HELPERS ---
+
+def _fields(**fields):
+    """Structured log fields for the current request, passed as extra="""
+    fields['route'] = request.path
+    return fields
+
+# Upper bound on items per batch request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 50000))
+
+def _batch_items(content, key):
+    """Pull the item list out of a batch body; returns (items, error)"""
+    if not isinstance(content, dict) or key not in content:
+        return None, f"{key} is required"
+    items = content[key]
+    if not isinstance(items, list):
+        return None, f"{key} must be an array"
+    if len(items) > MAX_BATCH_SIZE:
+        return None, f"{key} may contain at most {MAX_BATCH_SIZE} items"
+    return items, None
+
+def _numeric_column(items, field):
+    """Read one field of every item as a float column
+
+    Returns (values, missing, invalid); values is NaN wherever the field is
+    missing or not a number.
+    """
+    raw = [item.get(field) if isinstance(item, dict) else None for item in items]
+    missing = np.array([not isinstance(item, dict) or field not in item for item in items], dtype=bool)
+    # float(None) fails in the single-item routes, but numpy reads None as NaN
+    invalid = np.array([val is None for val in raw], dtype=bool)
+    try:
+        # Fast path: the whole column converts in one go
+        values = np.asarray(raw, dtype=float)
+        if values.ndim != 1:
+            raise ValueError("nested values")
+    except (ValueError, TypeError):
+        values = np.full(len(items), np.nan)
+        for i, val in enumerate(raw):
+            try:
+                values[i] = float(val)
+            except (ValueError, TypeError):
+                invalid[i] = True
+    invalid &= ~missing
+    return values, missing, invalid
+
+def _batch_response(results, errors):
+    """Wrap per-item results, replacing failed items with their error in place"""
+    results = [
+        {"error": err} if err is not None else result
+        for result, err in zip(results, errors)
+    ]
+    error_count = sum(err is not None for err in errors)
+    if error_count:
+        BATCH_ITEM_ERRORS.inc(request.endpoint, amount=error_count)
+    with _stage('serialize'):
+        response = jsonify({
+            "results": results,
+            "count": len(results),
+            "error_count": error_count
+        })
+    return response, 200
+
+def _member_result(record):
+    """get_data response body for a stored record (table columns only)"""
+    result = {col: val for col, val in record.items() if col not in scoring.SCORE_COLUMNS}
+    result['found'] = True
+    result['message'] = "User found"
+    return result
+
+def _encode_member(record):
+    """Encoded get_data response body for a stored record"""
+    return app.json.encode(_member_result(record))
+
+def _assess(borrowers, user_id):
+    """Lookup -> risk score -> ECL for one member, from precomputed columns"""
+    record = borrowers.get(user_id)
+    if record is None:
+        NOT_FOUND.inc(request.endpoint)
+        return {
+            "member_id": user_id,
+            "found": False,
+            "message": "User not found",
+            "fico_range_high": None,
+            "annual_inc": None,
+            "loan_amnt": None,
+            "loan_status": None,
+            "risk_score": None,
+            "risk_category": None,
+            "expected_credit_loss": None,
+            "currency": "USD"
+        }
+    
+    result = dict(record)
+    for col in scoring.SCORE_COLUMNS:
+        result.setdefault(col, None)
+    result['found'] = True
+    result['message'] = "User found"
+    result['currency'] = "USD"
+    return result
+
+# Memoized responses for the pure scoring endpoints (size 0 disables)
+response_cache = ResponseCache(
+    max_size=int(os.environ.get('RESPONSE_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+)
+
+def cached_response(view):
+    """Serve repeat requests for a pure endpoint from the response cache
+
+    Keyed on the route and raw JSON body, so a hit skips parsing,
+    validation, computation and serialization. Only 200s are cached.
+    """
+    @functools.wraps(view)
+    def wrapper():
+        if not response_cache.enabled or not request.is_json:
+            return view()
+        key = (request.path, request.get_data())
+        body = response_cache.get(key)
+        if body is not None:
+            return app.response_class(body, status=200, mimetype='application/json')
+        response, status = view()
+        if status == 200:
+            response_cache.put(key, response.get_data())
+        return response, status
+    return wrapper
+
+# Micro-batching of concurrent single-item requests (see coalescer.py); off
+# unless COALESCE_WINDOW_MS is set, and only useful with threaded workers
+COALESCE_WINDOW = float(os.environ.get('COALESCE_WINDOW_MS', 0)) / 1000
+COALESCE_MAX_BATCH = int(os.environ.get('COALESCE_MAX_BATCH', 256))
+
+def _score_one(item):
+    fico, income = item
+    score = scoring.risk_score(fico, income)
+    return round(score, 2), scoring.risk_category(score)
+
+def _score_many(items):
+    """Coalesced /risk_score: [(fico, income)] -> [(rounded score, category)]"""
+    fico, income = np.array(items, dtype=float).T
+    return scoring.score_results(fico, income)
+
+def _ecl_one(item):
+    loan, score = item
+    return round(scoring.expected_credit_loss(loan, score), 2)
+
+def _ecl_many(items):
+    """Coalesced /calc_ecl: [(loan, risk score)] -> [rounded ECL]"""
+    loans, scores = np.array(items, dtype=float).T
+    return [round(loss, 2) for loss in scoring.expected_credit_losses(loans, scores).tolist()]
+
+def _lookup_one(item):
+    borrowers, user_id = item
+    return borrowers.get_encoded(user_id, _encode_member)
+
+def _lookup_many(items):
+    """Coalesced /get_data: [(store, member_id)] -> [encoded body or None]
+
+    The uncached ids of each store are resolved together: one searchsorted
+    over a sorted index, or one IN (...) query on SQLite.
+    """
+    bodies = [None] * len(items)
+    groups = {}
+    for i, (borrowers, user_id) in enumerate(items):
+        groups.setdefault(id(borrowers), (borrowers, []))[1].append(i)
+    for borrowers, indexes in groups.values():
+        found = borrowers.get_encoded_many([items[i][1] for i in indexes], _encode_member)
+        for i, body in zip(indexes, found):
+            bodies[i] = body
+    return bodies
+
+def _coalescer(name, handler, single):
+    return coalescer.Coalescer(name, handler, single, window=COALESCE_WINDOW, max_batch=COALESCE_MAX_BATCH,
+                               batch_sizes=COALESCED_BATCH_SIZE, queue_delay=COALESCER_QUEUE_DELAY)
+
+coalescers = {
+    'risk_score': _coalescer('risk_score', _score_many, _score_one),
+    'calc_ecl': _coalescer('calc_ecl', _ecl_many, _ecl_one),
+    'get_data': _coalescer('get_data', _lookup_many, _lookup_one),
+}
+
+def _not_an_object(items):
+    """Boolean mask of items that are not JSON objects"""
+    return np.array([not isinstance(item, dict) for item in items], dtype=bool)
+
+# --- 4. THE ENDPOINTS ---
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify service is running"""
+    borrowers = store
     return jsonify({
         "status": "healthy",
         "service": "Credit Risk API",
-        "records_loaded": len(df)
+        "records_loaded": len(borrowers),
+        "dataset_version": borrowers.version,
+        "dataset_source": borrowers.source,
+        "dataset_loaded_at": borrowers.loaded_at,
+        "response_cache": response_cache.stats(),
+        "coalescer": {name: c.stats() for name, c in coalescers.items()}
     }), 200
 
 @app.route('/get_data', methods=['POST'])
@@ -42,31 +433,33 @@ def get_data():
     """Step 1: Retrieve user credit data by member_id"""
     try:
         # Validate request has JSON body
-        if not request.json:
-            logger.error("No JSON body provided")
+        with _stage('parse'):
+            content = request.json
+        if not content:
+            logger.error("No JSON body provided", extra=_fields())
             return jsonify({"error": "Request must include JSON body"}), 400
         
-        content = request.json
-        
         # Validate member_id is provided
         if 'member_id' not in content:
-            logger.error("Missing member_id in request")
+            logger.error("Missing member_id in request", extra=_fields())
             return jsonify({"error": "member_id is required"}), 400
         
         user_id = content.get('member_id')
-        logger.info(f"Received request for User: {user_id}")
+        logger.info("Received request for User: %s", user_id, extra=_fields(member_id=user_id))
         
         # Validate member_id is numeric
         try:
             user_id = int(user_id)
         except (ValueError, TypeError):
-            logger.error(f"Invalid member_id format: {user_id}")
+            logger.error("Invalid member_id format: %s", user_id, extra=_fields())
             return jsonify({"error": "member_id must be a valid integer"}), 400
         
-        # Look up user in DataFrame
-        user = df[df['member_id'] == user_id]
-        if user.empty:
-            logger.warning(f"User not found: {user_id}")
+        # Look up user in the member_id index; repeat lookups reuse the encoded body
+        with _stage('lookup'):
+            body = coalescers['get_data'].submit((store, user_id))
+        if body is None:
+            NOT_FOUND.inc('get_data')
+            logger.warning("User not found: %s", user_id, extra=_fields(member_id=user_id, outcome="not_found"))
             return jsonify({
                 "member_id": user_id,
                 "found": False,
@@ -77,41 +470,34 @@ def get_data():
                 "loan_status": None
             }), 200
         
-        # Convert numpy types to native python types for JSON serialization
-        result = user.iloc[0].to_dict()
-        result['found'] = True
-        result['message'] = "User found"
-        for key, val in result.items():
-            if pd.isna(val):
-                result[key] = None
-            elif hasattr(val, 'item'):  # numpy types
-                result[key] = val.item()
-        
-        logger.info(f"Successfully retrieved data for user {user_id}")
-        return jsonify(result), 200
+        logger.info("Successfully retrieved data for user %s", user_id, extra=_fields(member_id=user_id, outcome="found"))
+        with _stage('serialize'):
+            response = app.response_class(body, mimetype='application/json')
+        return response, 200
         
     except Exception as e:
-        logger.error(f"Unexpected error in get_data: {str(e)}")
+        logger.error("Unexpected error in get_data: %s", e, extra=_fields(outcome="error"))
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/risk_score', methods=['POST'])
+@cached_response
 def risk_score():
     """Step 2: Calculate risk score based on FICO and income"""
     try:
         # Validate request has JSON body
-        if not request.json:
-            logger.error("No JSON body provided")
+        with _stage('parse'):
+            content = request.json
+        if not content:
+            logger.error("No JSON body provided", extra=_fields())
             return jsonify({"error": "Request must include JSON body"}), 400
         
-        content = request.json
-        
         # Validate required fields
         if 'fico_range_high' not in content:
-            logger.error("Missing fico_range_high in request")
+            logger.error("Missing fico_range_high in request", extra=_fields())
             return jsonify({"error": "fico_range_high is required"}), 400
         
         if 'annual_inc' not in content:
-            logger.error("Missing annual_inc in request")
+            logger.error("Missing annual_inc in request", extra=_fields())
             return jsonify({"error": "annual_inc is required"}), 400
         
         # Parse and validate inputs
@@ -119,64 +505,56 @@ def risk_score():
             fico = float(content.get('fico_range_high'))
             income = float(content.get('annual_inc'))
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid numeric values: {e}")
+            logger.error("Invalid numeric values: %s", e, extra=_fields())
             return jsonify({"error": "fico_range_high and annual_inc must be valid numbers"}), 400
         
         # Validate FICO range (300-850 is standard range)
         if fico < 300 or fico > 850:
-            logger.warning(f"FICO score out of typical range: {fico}")
+            logger.warning("FICO score out of typical range: %s", fico, extra=_fields())
         
         # Validate income is positive
         if income < 0:
-            logger.error(f"Invalid negative income: {income}")
+            logger.error("Invalid negative income: %s", income, extra=_fields())
             return jsonify({"error": "annual_inc must be positive"}), 400
         
-        logger.info(f"Calculating risk for FICO: {fico}, Income: {income}")
+        logger.info("Calculating risk for FICO: %s, Income: %s", fico, income, extra=_fields())
         
-        # Logic: Higher FICO = Lower Score (Risk)
-        base_score = 100 - (fico / 8.5) 
-        if income > 80000:
-            base_score -= 15
-            
-        final_score = max(0, min(100, base_score))
-        
-        # Categorize risk: Low (0-30), Medium (30-60), High (60-100)
-        if final_score < 30:
-            risk_category = "Low"
-        elif final_score < 60:
-            risk_category = "Medium"
-        else:
-            risk_category = "High"
+        # Logic: Higher FICO = Lower Score (Risk), see scoring.py
+        with _stage('compute'):
+            final_score, risk_category = coalescers['risk_score'].submit((fico, income))
         
-        logger.info(f"Risk calculated: {final_score:.2f} ({risk_category})")
+        logger.info("Risk calculated: %.2f (%s)", final_score, risk_category, extra=_fields(outcome=risk_category))
         
-        return jsonify({
-            "risk_score": round(final_score, 2),
-            "risk_category": risk_category
-        }), 200
+        with _stage('serialize'):
+            response = jsonify({
+                "risk_score": final_score,
+                "risk_category": risk_category
+            })
+        return response, 200
         
     except Exception as e:
-        logger.error(f"Unexpected error in risk_score: {str(e)}")
+        logger.error("Unexpected error in risk_score: %s", e, extra=_fields(outcome="error"))
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/calc_ecl', methods=['POST'])
+@cached_response
 def calc_ecl():
     """Step 3: Calculate Expected Credit Loss"""
     try:
         # Validate request has JSON body
-        if not request.json:
-            logger.error("No JSON body provided")
+        with _stage('parse'):
+            content = request.json
+        if not content:
+            logger.error("No JSON body provided", extra=_fields())
             return jsonify({"error": "Request must include JSON body"}), 400
         
-        content = request.json
-        
         # Validate required fields
         if 'loan_amnt' not in content:
-            logger.error("Missing loan_amnt in request")
+            logger.error("Missing loan_amnt in request", extra=_fields())
             return jsonify({"error": "loan_amnt is required"}), 400
         
         if 'risk_score' not in content:
-            logger.error("Missing risk_score in request")
+            logger.error("Missing risk_score in request", extra=_fields())
             return jsonify({"error": "risk_score is required"}), 400
         
         # Parse and validate inputs
@@ -184,48 +562,542 @@ def calc_ecl():
             loan = float(content.get('loan_amnt'))
             score = float(content.get('risk_score'))
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid numeric values: {e}")
+            logger.error("Invalid numeric values: %s", e, extra=_fields())
             return jsonify({"error": "loan_amnt and risk_score must be valid numbers"}), 400
         
         # Validate loan amount is positive
         if loan < 0:
-            logger.error(f"Invalid negative loan amount: {loan}")
+            logger.error("Invalid negative loan amount: %s", loan, extra=_fields())
             return jsonify({"error": "loan_amnt must be positive"}), 400
         
         # Validate risk_score range (0-100)
         if score < 0 or score > 100:
-            logger.error(f"Risk score out of range: {score}")
+            logger.error("Risk score out of range: %s", score, extra=_fields())
             return jsonify({"error": "risk_score must be between 0 and 100"}), 400
         
-        logger.info(f"Calculating ECL for Loan: {loan}, Risk Score: {score}")
+        logger.info("Calculating ECL for Loan: %s, Risk Score: %s", loan, score, extra=_fields())
         
         # Logic: Expected Loss = Loan * (Risk / 100)
-        loss = loan * (score / 100)
+        with _stage('compute'):
+            loss = coalescers['calc_ecl'].submit((loan, score))
         
-        logger.info(f"Expected Credit Loss calculated: ${loss:.2f}")
+        logger.info("Expected Credit Loss calculated: $%.2f", loss, extra=_fields(outcome="calculated"))
         
-        return jsonify({
-            "expected_credit_loss": round(loss, 2),
-            "currency": "USD"
-        }), 200
+        with _stage('serialize'):
+            response = jsonify({
+                "expected_credit_loss": loss,
+                "currency": "USD"
+            })
+        return response, 200
         
     except Exception as e:
-        logger.error(f"Unexpected error in calc_ecl: {str(e)}")
+        logger.error("Unexpected error in calc_ecl: %s", e, extra=_fields(outcome="error"))
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/get_data/batch', methods=['POST'])
+def get_data_batch():
+    """Batch Step 1: Retrieve credit data for many member_ids"""
+    try:
+        with _stage('parse'):
+            items, error = _batch_items(request.get_json(silent=True), 'member_ids')
+        if error:
+            logger.error("Invalid get_data batch: %s", error, extra=_fields())
+            return jsonify({"error": error}), 400
+        
+        logger.info("Received batch lookup for %d users", len(items), extra=_fields(count=len(items)))
+        borrowers = store
+        
+        results = []
+        errors = []
+        for raw_id in items:
+            try:
+                user_id = int(raw_id)
+            except (ValueError, TypeError):
+                results.append(None)
+                errors.append("member_id must be a valid integer")
+                continue
+            
+            record = borrowers.get(user_id)
+            if record is None:
+                NOT_FOUND.inc('get_data_batch')
+                results.append({
+                    "member_id": user_id,
+                    "found": False,
+                    "message": "User not found",
+                    "fico_range_high": None,
+                    "annual_inc": None,
+                    "loan_amnt": None,
+                    "loan_status": None
+                })
+            else:
+                results.append(_member_result(record))
+            errors.append(None)
+        
+        return _batch_response(results, errors)
+        
+    except Exception as e:
+        logger.error("Unexpected error in get_data_batch: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/risk_score/batch', methods=['POST'])
+def risk_score_batch():
+    """Batch Step 2: Calculate risk scores for many FICO/income pairs"""
+    try:
+        with _stage('parse'):
+            items, error = _batch_items(request.get_json(silent=True), 'items')
+        if error:
+            logger.error("Invalid risk_score batch: %s", error, extra=_fields())
+            return jsonify({"error": error}), 400
+        
+        logger.info("Calculating risk for batch of %d", len(items), extra=_fields(count=len(items)))
+        
+        fico, fico_missing, fico_invalid = _numeric_column(items, 'fico_range_high')
+        income, income_missing, income_invalid = _numeric_column(items, 'annual_inc')
+        
+        # Same checks as /risk_score; later assignments take precedence
+        errors = np.full(len(items), None, dtype=object)
+        errors[income < 0] = "annual_inc must be positive"
+        errors[fico_invalid | income_invalid] = "fico_range_high and annual_inc must be valid numbers"
+        errors[income_missing] = "annual_inc is required"
+        errors[fico_missing] = "fico_range_high is required"
+        errors[_not_an_object(items)] = "Each item must be a JSON object"
+        
+        # Same values as /risk_score item by item (NaN -> 100, int bounds)
+        with _stage('compute'):
+            scored = scoring.score_results(fico, income)
+        
+        results = [
+            {"risk_score": score, "risk_category": category}
+            for score, category in scored
+        ]
+        return _batch_response(results, errors.tolist())
+        
+    except Exception as e:
+        logger.error("Unexpected error in risk_score_batch: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/calc_ecl/batch', methods=['POST'])
+def calc_ecl_batch():
+    """Batch Step 3: Calculate Expected Credit Loss for many loans"""
+    try:
+        with _stage('parse'):
+            items, error = _batch_items(request.get_json(silent=True), 'items')
+        if error:
+            logger.error("Invalid calc_ecl batch: %s", error, extra=_fields())
+            return jsonify({"error": error}), 400
+        
+        logger.info("Calculating ECL for batch of %d", len(items), extra=_fields(count=len(items)))
+        
+        loan, loan_missing, loan_invalid = _numeric_column(items, 'loan_amnt')
+        score, score_missing, score_invalid = _numeric_column(items, 'risk_score')
+        
+        # Same checks as /calc_ecl; later assignments take precedence
+        errors = np.full(len(items), None, dtype=object)
+        errors[(score < 0) | (score > 100)] = "risk_score must be between 0 and 100"
+        errors[loan < 0] = "loan_amnt must be positive"
+        errors[loan_invalid | score_invalid] = "loan_amnt and risk_score must be valid numbers"
+        errors[score_missing] = "risk_score is required"
+        errors[loan_missing] = "loan_amnt is required"
+        errors[_not_an_object(items)] = "Each item must be a JSON object"
+        
+        with _stage('compute'):
+            losses = scoring.expected_credit_losses(loan, score)
+        
+        results = [
+            {"expected_credit_loss": round(loss, 2), "currency": "USD"}
+            for loss in losses.tolist()
+        ]
+        return _batch_response(results, errors.tolist())
+        
+    except Exception as e:
+        logger.error("Unexpected error in calc_ecl_batch: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/assess', methods=['POST'])
+def assess():
+    """Full pipeline: member lookup, risk score and ECL in one call
+
+    Accepts either {"member_id": id} or {"member_ids": [ids]}.
+    """
+    try:
+        with _stage('parse'):
+            content = request.get_json(silent=True)
+        if not content:
+            logger.error("No JSON body provided", extra=_fields())
+            return jsonify({"error": "Request must include JSON body"}), 400
+        
+        borrowers = store
+        
+        # Many members: same in-place error reporting as the batch routes
+        if isinstance(content, dict) and 'member_ids' in content:
+            items, error = _batch_items(content, 'member_ids')
+            if error:
+                logger.error("Invalid assess batch: %s", error, extra=_fields())
+                return jsonify({"error": error}), 400
+            
+            logger.info("Assessing batch of %d users", len(items), extra=_fields(count=len(items)))
+            results = []
+            errors = []
+            for raw_id in items:
+                try:
+                    user_id = int(raw_id)
+                except (ValueError, TypeError):
+                    results.append(None)
+                    errors.append("member_id must be a valid integer")
+                    continue
+                results.append(_assess(borrowers, user_id))
+                errors.append(None)
+            return _batch_response(results, errors)
+        
+        if not isinstance(content, dict) or 'member_id' not in content:
+            logger.error("Missing member_id in request", extra=_fields())
+            return jsonify({"error": "member_id is required"}), 400
+        
+        try:
+            user_id = int(content.get('member_id'))
+        except (ValueError, TypeError):
+            logger.error("Invalid member_id format: %s", content.get('member_id'), extra=_fields())
+            return jsonify({"error": "member_id must be a valid integer"}), 400
+        
+        result = _assess(borrowers, user_id)
+        if result['found']:
+            logger.info("Assessed user %s: %s (%s)", user_id, result['risk_score'], result['risk_category'],
+                        extra=_fields(member_id=user_id, outcome=result['risk_category']))
+        else:
+            logger.warning("User not found: %s", user_id, extra=_fields(member_id=user_id, outcome="not_found"))
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.error("Unexpected error in assess: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+# Largest top_n accepted by /portfolio_summary
+MAX_TOP_N = 1000
+
+# One summary per (store, top_n); rebuilt after a reload swaps the store
+_summary_cache = {}
+_summary_lock = threading.Lock()
+
+def _portfolio_summary(borrowers, top_n):
+    with _summary_lock:
+        cached = _summary_cache.get(top_n)
+        if cached is not None and cached[0] is borrowers:
+            return cached[1]
+    result = portfolio.summarize_store(borrowers, top_n).result()
+    result["dataset_version"] = borrowers.version
+    with _summary_lock:
+        # Entries for an older store are dropped at the first miss
+        if any(entry[0] is not borrowers for entry in _summary_cache.values()):
+            _summary_cache.clear()
+        _summary_cache[top_n] = (borrowers, result)
+    return result
+
+@app.route('/portfolio_summary', methods=['GET'])
+def portfolio_summary():
+    """Score distribution, tier counts and ECL totals for the whole loaded portfolio"""
+    try:
+        try:
+            top_n = int(request.args.get('top_n', portfolio.TOP_N))
+        except ValueError:
+            logger.error("Invalid top_n: %s", request.args.get('top_n'), extra=_fields())
+            return jsonify({"error": "top_n must be a valid integer"}), 400
+        if not 0 <= top_n <= MAX_TOP_N:
+            logger.error("top_n out of range: %s", top_n, extra=_fields())
+            return jsonify({"error": f"top_n must be between 0 and {MAX_TOP_N}"}), 400
+        
+        with _stage('compute'):
+            result = _portfolio_summary(store, top_n)
+        logger.info("Portfolio summary for %d borrowers", result["borrowers"], extra=_fields(count=result["borrowers"]))
+        with _stage('serialize'):
+            response = jsonify(result)
+        return response, 200
+        
+    except Exception as e:
+        logger.error("Unexpected error in portfolio_summary: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+# Page size limits for /query
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+# One QueryIndex for the current store; rebuilt after a reload swaps the store
+_query_index = None
+_query_index_lock = threading.Lock()
+
+def _get_query_index(borrowers):
+    global _query_index
+    with _query_index_lock:
+        if _query_index is None or _query_index.store is not borrowers:
+            _query_index = query_index.QueryIndex(borrowers)
+        return _query_index
+
+# Sort now, in the preloading gunicorn master, so forked workers share the
+# orders instead of each building its own (a snapshot's are memory-mapped)
+if SHARED_DATASET and store.columnar:
+    _get_query_index(store).build()
+
+@app.route('/query', methods=['POST'])
+def query():
+    """Borrowers matching range filters, ordered by one column, one page at a time"""
+    try:
+        with _stage('parse'):
+            content = request.get_json(silent=True)
+        if content is None:
+            content = {}
+        if not isinstance(content, dict):
+            logger.error("Query body is not an object", extra=_fields())
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+
+        borrowers = store
+        if not borrowers.columnar:
+            logger.error("Query needs column arrays; backend is %s", STORAGE_BACKEND, extra=_fields())
+            return jsonify({"error": f"/query is not available with the {STORAGE_BACKEND} storage backend"}), 501
+        try:
+            filters = query_index.parse_filters(content.get('filters'))
+            order_by = content.get('order_by', 'risk_score')
+            if order_by not in query_index.INDEXED_COLUMNS:
+                raise query_index.QueryError(f"order_by must be one of {', '.join(query_index.INDEXED_COLUMNS)}")
+            order = content.get('order', 'desc')
+            if order not in ('asc', 'desc'):
+                raise query_index.QueryError("order must be 'asc' or 'desc'")
+            limit = content.get('limit', DEFAULT_QUERY_LIMIT)
+            if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_QUERY_LIMIT:
+                raise query_index.QueryError(f"limit must be an integer between 1 and {MAX_QUERY_LIMIT}")
+            key = query_index.query_key(filters, order_by, order == 'desc', limit)
+            after = 0
+            if content.get('cursor') is not None:
+                if not isinstance(content['cursor'], str):
+                    raise query_index.QueryError("cursor is invalid")
+                after = query_index.decode_cursor(content['cursor'], borrowers.version, key)
+        except query_index.QueryError as e:
+            logger.error("Invalid query: %s", e, extra=_fields())
+            return jsonify({"error": str(e)}), 400
+
+        with _stage('lookup'):
+            index = _get_query_index(borrowers)
+            positions, next_after = index.search(filters, order_by, order == 'desc', limit, after)
+            results = [borrowers.record_at(int(pos)) for pos in positions]
+
+        logger.info("Query returned %d borrowers", len(results), extra=_fields(count=len(results)))
+        with _stage('serialize'):
+            response = jsonify({
+                "results": results,
+                "count": len(results),
+                "next_cursor": None if next_after is None else query_index.encode_cursor(borrowers.version, key, next_after),
+                "dataset_version": borrowers.version
+            })
+        return response, 200
+
+    except Exception as e:
+        logger.error("Unexpected error in query: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+def _export_stream(chunks, fmt):
+    """Pass export chunks through, logging failures that happen mid-stream"""
+    try:
+        yield from chunks
+    except Exception as e:
+        # The 200 status is already sent; the client sees a truncated body
+        logger.error("Export (%s) failed mid-stream: %s", fmt, e, extra={"outcome": "error"})
+        raise
+
+@app.route('/export', methods=['GET'])
+def export_portfolio():
+    """Stream every borrower with risk score, category and ECL as NDJSON or CSV"""
+    try:
+        borrowers = store
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in export.FORMATS:
+            logger.error("Invalid export format: %s", fmt, extra=_fields())
+            return jsonify({"error": f"format must be one of {', '.join(export.FORMATS)}"}), 400
+
+        # Repeat a parameter to keep several labels, e.g. ?risk_category=High&risk_category=Medium
+        filters = {}
+        for column in export.FILTER_COLUMNS:
+            wanted = request.args.getlist(column)
+            if not wanted:
+                continue
+            if column not in borrowers.columns + borrowers.score_columns:
+                logger.error("Export filter on missing column: %s", column, extra=_fields())
+                return jsonify({"error": f"{column} is not available in the loaded data"}), 400
+            if column == 'risk_category' and not set(wanted) <= set(scoring.RISK_CATEGORIES):
+                logger.error("Invalid risk_category filter: %s", wanted, extra=_fields())
+                return jsonify({"error": f"risk_category must be one of {', '.join(scoring.RISK_CATEGORIES)}"}), 400
+            filters[column] = wanted
+
+        logger.info("Exporting %d borrowers as %s", len(borrowers), fmt, extra=_fields(count=len(borrowers)))
+        # The generator keeps its own reference to the store, so a reload
+        # during the download doesn't mix two versions
+        if fmt == 'csv':
+            chunks = export.iter_csv(borrowers, filters)
+        else:
+            chunks = export.iter_ndjson(borrowers, app.json.dumps, filters)
+        return app.response_class(_export_stream(chunks, fmt), mimetype=export.FORMATS[fmt], headers={
+            "Content-Disposition": f"attachment; filename=portfolio.{fmt}",
+            "X-Dataset-Version": str(borrowers.version)
+        }), 200
+
+    except Exception as e:
+        logger.error("Unexpected error in export: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+# Limits and worker processes for /simulate. Runs happen inside the
+# request, so MAX_SIMULATION_DRAWS caps scenarios * simulated borrowers
+# (about 10 s per 5e8 draws on one core). With SIMULATION_WORKERS > 1 one
+# pool of spawned processes is shared by every request until the data is
+# reloaded.
+MAX_SIMULATION_SCENARIOS = int(os.environ.get('MAX_SIMULATION_SCENARIOS', 100000))
+MAX_SIMULATION_DRAWS = int(float(os.environ.get('MAX_SIMULATION_DRAWS', 5e8)))
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 1))
+SIMULATION_CACHE_SIZE = 32
+
+# One report per (store, parameters); runs are seeded, so a repeat is identical
+_simulation_cache = {}
+_simulation_lock = threading.Lock()
+# (store, Portfolio, SimulationPool or None) for the loaded data
+_simulation_portfolio = None
+_portfolio_lock = threading.Lock()
+
+def _portfolio(borrowers):
+    """Portfolio and worker pool for borrowers, rebuilt when the store changes"""
+    global _simulation_portfolio
+    with _portfolio_lock:
+        current = _simulation_portfolio
+        if current is not None and current[0] is borrowers:
+            return current[1], current[2]
+        portfolio = simulation.portfolio_from_store(borrowers)
+        pool = simulation.SimulationPool(portfolio, SIMULATION_WORKERS) if SIMULATION_WORKERS > 1 else None
+        _simulation_portfolio = (borrowers, portfolio, pool)
+    if current is not None and current[2] is not None:
+        # Runs already queued on the old pool still finish
+        current[2].shutdown(wait=False)
+    return portfolio, pool
+
+def _simulation(borrowers, portfolio, pool, scenarios, correlation, lgd, seed):
+    key = (scenarios, correlation, lgd, seed)
+    with _simulation_lock:
+        cached = _simulation_cache.get(key)
+        if cached is not None and cached[0] is borrowers:
+            return cached[1]
+    result = simulation.run(portfolio, scenarios, correlation, seed, lgd=lgd, pool=pool)
+    result["dataset_version"] = borrowers.version
+    with _simulation_lock:
+        if len(_simulation_cache) >= SIMULATION_CACHE_SIZE or any(
+                entry[0] is not borrowers for entry in _simulation_cache.values()):
+            _simulation_cache.clear()
+        _simulation_cache[key] = (borrowers, result)
+    return result
+
+def _number(content, name, default):
+    value = content.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    return value
+
+@app.route('/simulate', methods=['POST'])
+def simulate():
+    """Monte Carlo loss distribution, VaR and expected shortfall for the loaded portfolio"""
+    try:
+        with _stage('parse'):
+            content = request.get_json(silent=True)
+        if content is None:
+            content = {}
+        if not isinstance(content, dict):
+            logger.error("Simulation body is not an object", extra=_fields())
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+
+        try:
+            scenarios = _number(content, 'scenarios', simulation.SCENARIOS)
+            if not isinstance(scenarios, int) or not 1 <= scenarios <= MAX_SIMULATION_SCENARIOS:
+                raise ValueError(f"scenarios must be an integer between 1 and {MAX_SIMULATION_SCENARIOS}")
+            correlation = float(_number(content, 'correlation', simulation.CORRELATION))
+            if not 0 <= correlation < 1:
+                raise ValueError("correlation must be at least 0 and below 1")
+            lgd = float(_number(content, 'lgd', simulation.LGD))
+            if not 0 <= lgd <= 1:
+                raise ValueError("lgd must be between 0 and 1")
+            seed = _number(content, 'seed', simulation.SEED)
+            if not isinstance(seed, int) or seed < 0:
+                raise ValueError("seed must be a non-negative integer")
+        except ValueError as e:
+            logger.error("Invalid simulation parameters: %s", e, extra=_fields())
+            return jsonify({"error": str(e)}), 400
+
+        borrowers = store
+        if 'risk_score' not in borrowers.score_columns:
+            logger.error("Simulation needs risk scores; none in the loaded data", extra=_fields())
+            return jsonify({"error": "Loaded data has no risk scores to simulate"}), 400
+
+        with _stage('compute'):
+            portfolio, pool = _portfolio(borrowers)
+            if scenarios * portfolio.simulated > MAX_SIMULATION_DRAWS:
+                limit = max(1, MAX_SIMULATION_DRAWS // portfolio.simulated)
+                logger.error("Simulation too large: %d scenarios over %d borrowers", scenarios,
+                             portfolio.simulated, extra=_fields())
+                return jsonify({"error": f"scenarios must be at most {limit} for the loaded data "
+                                         f"({portfolio.simulated} borrowers to simulate)"}), 400
+            result = _simulation(borrowers, portfolio, pool, scenarios, correlation, lgd, seed)
+        logger.info("Simulated %d scenarios over %d borrowers", scenarios, result["borrowers"],
+                    extra=_fields(count=result["borrowers"]))
+        with _stage('serialize'):
+            response = jsonify(result)
+        return response, 200
+
+    except Exception as e:
+        logger.error("Unexpected error in simulate: %s", e, extra=_fields(outcome="error"))
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    return app.response_class(REGISTRY.render(), status=200,
+                              mimetype='text/plain; version=0.0.4')
+
+# Admin token for /admin/reload; the endpoint is disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload the borrower data from disk without restarting
+
+    Only reloads the worker that serves the request; with several gunicorn
+    workers set DATASET_WATCH_INTERVAL so every worker picks up new files.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        logger.warning("Rejected /admin/reload with bad token", extra=_fields(outcome="unauthorized"))
+        return jsonify({"error": "Invalid admin token"}), 401
+    
+    # Build the new store in the background; traffic keeps using the old one
+    threading.Thread(target=_reload_quietly, daemon=True).start()
+    logger.info("Dataset reload requested")
+    return jsonify({
+        "status": "reloading",
+        "dataset_version": store.version
+    }), 202
+
 if __name__ == "__main__":
     logger.info("="*50)
     logger.info("CREDIT RISK API SERVER STARTING")
     logger.info("="*50)
-    logger.info(f"Loaded {len(df)} borrower records")
+    logger.info("Loaded %d borrower records", len(store))
     logger.info("Endpoints available:")
     logger.info("  GET  /health      - Health check")
     logger.info("  POST /get_data    - Retrieve user data")
     logger.info("  POST /risk_score  - Calculate risk score")
     logger.info("  POST /calc_ecl    - Calculate expected credit loss")
+    logger.info("  POST /assess      - Lookup, risk score and ECL in one call")
+    logger.info("  GET  /portfolio_summary - Tier counts, ECL totals, riskiest borrowers")
+    logger.info("  POST /query       - Range filters and top-N over the portfolio")
+    logger.info("  GET  /export      - Stream the scored portfolio as NDJSON or CSV")
+    logger.info("  POST /simulate    - Monte Carlo portfolio loss, VaR and expected shortfall")
+    logger.info("  GET  /metrics     - Prometheus metrics")
+    logger.info("  POST /admin/reload - Reload borrower data (needs ADMIN_TOKEN)")
+    logger.info("  POST /get_data/batch, /risk_score/batch, /calc_ecl/batch - Batch variants")
     logger.info("="*50)
     
     # Use PORT from environment (for cloud platforms) or default to 5000
-    import os
     port = int(os.environ.get('PORT', 5000))
+    start_dataset_watcher()
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,166 @@
+# ASGI Entry Point for Credit Risk API
+# Serves the same Flask app under an async server, e.g.
+#   uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+# The event loop holds thousands of idle keep-alive connections per process;
+# only requests being handled cost anything.
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as flask_app
+
+# Request bodies larger than this are rejected before reaching Flask
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 32 * 1024 * 1024))
+# Threads running the Flask app per process: a slow request (/simulate, a
+# large /export) holds one of them, never the event loop
+THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+# Returned by _read_body when the client goes away mid-request
+_DISCONNECTED = object()
+# Returned by _next_chunk after the last chunk
+_DONE = object()
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='asgi')
+
+
+def _environ(scope, body):
+    """PEP 3333 environ for an ASGI http scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        value = raw_value.decode('latin1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    """Collect the request body; None if it exceeds MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return _DISCONNECTED
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_error(send, status, message):
+    body = f'{{"error": "{message}"}}'.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Per-process setup, like gunicorn's post_fork hook
+            flask_app.start_dataset_watcher()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def _start(environ, start_response):
+    """Call the WSGI app and pull its first chunk (start_response may wait for it)"""
+    result = flask_app.app(environ, start_response)
+    chunks = iter(result)
+    return result, chunks, next(chunks, _DONE)
+
+
+def _close(result):
+    if hasattr(result, 'close'):
+        result.close()
+
+
+async def app(scope, receive, send):
+    """ASGI callable wrapping the Flask app's WSGI callable
+
+    Everything that runs Flask code (the call, each chunk of a streamed
+    response, close) happens on the THREADS executor, so the event loop
+    keeps serving other connections while a handler works. Chunks are sent
+    as they are produced.
+    """
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    body = await _read_body(receive)
+    if body is _DISCONNECTED:
+        return
+    if body is None:
+        await _send_error(send, 413, "Request body too large")
+        return
+
+    response = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [
+            (name.lower().encode('latin1'), value.encode('latin1'))
+            for name, value in headers
+        ]
+        return written.append
+
+    loop = asyncio.get_running_loop()
+    result, chunks, chunk = await loop.run_in_executor(_executor, _start, _environ(scope, body), start_response)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': response['status'],
+            'headers': response['headers']
+        })
+        # Anything passed to the legacy write() callable comes first
+        for written_chunk in written:
+            if written_chunk:
+                await send({'type': 'http.response.body', 'body': written_chunk, 'more_body': True})
+        while chunk is not _DONE:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(_executor, next, chunks, _DONE)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await loop.run_in_executor(_executor, _close, result)
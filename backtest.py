@@ -0,0 +1,376 @@
+# Risk Score Backtest
+# How well the risk score ranks and prices realized outcomes in the Kaggle
+# accepted-loans file: AUC, KS, calibration per risk tier and realized vs
+# expected loss, per issue-year vintage and overall
+#   python backtest.py [accepted.csv.gz] [--workers 4] [--nrows N] [--rebuild] [--json]
+#
+# Two passes over a process pool. Extraction parses the file block by
+# block (like ingestion.iter_parallel) and caches the scoring inputs and
+# outcomes of each resolved loan, split by vintage, under CACHE_DIR.
+# Scoring then runs one task per vintage over the cached arrays. A rerun
+# on an unchanged file, e.g. after editing scoring.py, skips extraction and
+# only repeats the scoring pass.
+
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ingestion
+import scoring
+
+ACCEPTED_FILE = ingestion.ACCEPTED_FILE
+CACHE_DIR = 'backtest_cache'
+CACHE_FORMAT = 1
+WORKERS = int(os.environ.get('BACKTEST_WORKERS', os.cpu_count() or 1))
+
+# Resolved loans only; Current, Late and In Grace Period have no outcome yet
+BAD_STATUSES = ('Charged Off', 'Default', 'Does not meet the credit policy. Status:Charged Off')
+GOOD_STATUSES = ('Fully Paid', 'Does not meet the credit policy. Status:Fully Paid')
+
+# Columns read from the accepted file; the repayment ones are optional
+BACKTEST_DTYPES = {
+    'id': str,
+    'loan_amnt': 'float64',
+    'annual_inc': 'float64',
+    'fico_range_high': 'float64',
+    'loan_status': 'category',
+    'issue_d': str,
+    'funded_amnt': 'float64',
+    'total_rec_prncp': 'float64',
+    'recoveries': 'float64'
+}
+REQUIRED_COLUMNS = ['loan_amnt', 'annual_inc', 'fico_range_high', 'loan_status', 'issue_d']
+
+# Cached per (block, vintage); the same ranges as ingestion.clean apply
+CACHED_COLUMNS = {
+    'fico_range_high': 'float32',
+    'annual_inc': 'float64',
+    'loan_amnt': 'float32',
+    'bad': 'bool',
+    'realized_loss': 'float64'
+}
+
+# Risk scores are rounded to 2 places, so one bin per 0.01 makes AUC and KS exact
+SCORE_BINS = 10001
+
+
+def realized_losses(chunk, bad):
+    """Principal lost per loan: 0 for good loans; for bad ones the funded
+    amount not repaid, less recoveries, when the file has the repayment
+    columns, else the whole loan (LGD 1, as the ECL formula assumes)"""
+    loss = np.where(bad, chunk['loan_amnt'].to_numpy(dtype=float), 0.0)
+    if 'total_rec_prncp' in chunk.columns:
+        funded = chunk['funded_amnt'] if 'funded_amnt' in chunk.columns else chunk['loan_amnt']
+        recoveries = chunk['recoveries'].fillna(0) if 'recoveries' in chunk.columns else 0
+        unpaid = (funded - chunk['total_rec_prncp'] - recoveries).clip(lower=0).to_numpy(dtype=float)
+        loss = np.where(bad & ~np.isnan(unpaid), unpaid, loss)
+    return loss
+
+
+def extract_block(header, first_row, data, block, cache_dir, nrows=None):
+    """Parse one block and cache its resolved loans, one file per vintage
+
+    Runs in a worker process. Returns the block's counts: rows read, and
+    per vintage the resolved loans kept and the unresolved ones skipped.
+    """
+    limit = None if nrows is None else max(nrows - first_row, 0)
+    columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Accepted file has no {', '.join(missing)} column")
+    usecols = [col for col in BACKTEST_DTYPES if col in columns]
+    chunk = pd.read_csv(io.BytesIO(header + data), usecols=usecols,
+                        dtype={col: BACKTEST_DTYPES[col] for col in usecols}, nrows=limit)
+
+    vintage = pd.to_datetime(chunk['issue_d'], format='%b-%Y', errors='coerce').dt.year
+    status = chunk['loan_status'].astype(object)
+    bad = status.isin(BAD_STATUSES).to_numpy()
+    resolved = bad | status.isin(GOOD_STATUSES).to_numpy()
+    unresolved = vintage[~resolved & status.notna().to_numpy()].dropna().astype(int).value_counts()
+
+    # member_id stands in for ingestion.clean's required column; it isn't cached
+    frame = pd.DataFrame({
+        'member_id': 0,
+        'loan_amnt': chunk['loan_amnt'],
+        'annual_inc': chunk['annual_inc'],
+        'fico_range_high': chunk['fico_range_high'],
+        'vintage': vintage,
+        'bad': bad,
+        'realized_loss': realized_losses(chunk, bad)
+    })[resolved]
+    frame = ingestion.clean(frame)
+
+    counts = {}
+    for year, group in frame.groupby('vintage', sort=True):
+        year = int(year)
+        np.savez(os.path.join(cache_dir, f"{block:05d}-{year}.npz"),
+                 **{col: group[col].to_numpy(dtype=dtype) for col, dtype in CACHED_COLUMNS.items()})
+        counts[year] = {'loans': len(group)}
+    for year, count in unresolved.items():
+        counts.setdefault(int(year), {'loans': 0})['unresolved'] = int(count)
+    return {'block': block, 'rows': len(chunk), 'kept': len(frame), 'vintages': counts}
+
+
+def _source(path, block_bytes, nrows):
+    """What a cache was built from; a different value means rebuild"""
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'block_bytes': block_bytes,
+        'nrows': nrows
+    }
+
+
+def load_manifest(cache_dir, source):
+    """The cache's manifest if it is complete and built from source, else None"""
+    path = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != CACHE_FORMAT or manifest.get('source') != source:
+        return None
+    return manifest
+
+
+def extract(path, cache_dir, pool, workers, block_bytes=ingestion.BLOCK_BYTES, nrows=None):
+    """Rebuild the cache from path; returns the new manifest
+
+    The main process decompresses; workers parse, keeping at most two
+    blocks per worker in flight.
+    """
+    source = _source(path, block_bytes, nrows)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Only this script's files, in case --cache points somewhere shared
+    for stale in glob.glob(os.path.join(cache_dir, '*.npz')) + glob.glob(os.path.join(cache_dir, 'manifest.json')):
+        os.remove(stale)
+
+    tasks = (
+        (header, first_row, data, block, cache_dir, nrows)
+        for block, (header, first_row, data, _) in enumerate(ingestion.iter_blocks(path, block_bytes, nrows))
+    )
+    blocks = []
+    if pool is None:
+        blocks = [extract_block(*args) for args in tasks]
+    else:
+        pending = deque()
+        for args in tasks:
+            pending.append(pool.submit(extract_block, *args))
+            if len(pending) >= 2 * workers:
+                blocks.append(pending.popleft().result())
+        blocks += [future.result() for future in pending]
+
+    vintages = {}
+    for result in blocks:
+        for year, counts in result['vintages'].items():
+            total = vintages.setdefault(str(year), {'loans': 0, 'unresolved': 0})
+            total['loans'] += counts['loans']
+            total['unresolved'] += counts.get('unresolved', 0)
+    manifest = {
+        'format': CACHE_FORMAT,
+        'source': source,
+        'rows_read': sum(result['rows'] for result in blocks),
+        'rows_kept': sum(result['kept'] for result in blocks),
+        'blocks': len(blocks),
+        'vintages': dict(sorted(vintages.items())),
+        'created': time.time()
+    }
+    # Written last: a cache without a manifest is rebuilt
+    with open(os.path.join(cache_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class Aggregate:
+    """Score-dependent totals for a set of loans; add() another to merge
+
+    Good and bad loans are counted per 0.01 of risk score, which is all AUC
+    and KS need, so vintages merge into the overall result exactly.
+    """
+
+    def __init__(self):
+        self.good = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.bad = np.zeros(SCORE_BINS, dtype=np.int64)
+        tiers = len(scoring.RISK_CATEGORIES)
+        self.tier_loans = np.zeros(tiers, dtype=np.int64)
+        self.tier_bad = np.zeros(tiers, dtype=np.int64)
+        self.tier_pd = np.zeros(tiers)
+        self.tier_expected = np.zeros(tiers)
+        self.tier_realized = np.zeros(tiers)
+        self.tier_loan_amnt = np.zeros(tiers)
+
+    def add_loans(self, fico, income, loan, bad, realized):
+        """Score the loans (as score_arrays does) and count them"""
+        raw = scoring.risk_scores(fico, income)
+        codes = scoring.risk_category_codes(raw)
+        scores = scoring.round2(raw)
+        expected = scoring.round2(scoring.expected_credit_losses(loan, scores))
+
+        bins = np.rint(scores * 100).astype(np.int64)
+        self.good += np.bincount(bins[~bad], minlength=SCORE_BINS)
+        self.bad += np.bincount(bins[bad], minlength=SCORE_BINS)
+        tiers = len(scoring.RISK_CATEGORIES)
+        self.tier_loans += np.bincount(codes, minlength=tiers)
+        self.tier_bad += np.bincount(codes[bad], minlength=tiers)
+        self.tier_pd += np.bincount(codes, weights=scores / 100, minlength=tiers)
+        self.tier_expected += np.bincount(codes, weights=expected, minlength=tiers)
+        self.tier_realized += np.bincount(codes, weights=realized, minlength=tiers)
+        self.tier_loan_amnt += np.bincount(codes, weights=loan, minlength=tiers)
+
+    def add(self, other):
+        for name, values in vars(other).items():
+            setattr(self, name, getattr(self, name) + values)
+        return self
+
+    def auc(self):
+        """P(a bad loan scores riskier than a good one), ties counting half"""
+        goods, bads = self.good.sum(), self.bad.sum()
+        if not goods or not bads:
+            return None
+        good_below = np.cumsum(self.good) - self.good
+        return float((self.bad * (good_below + 0.5 * self.good)).sum() / (goods * bads))
+
+    def ks(self):
+        """Largest gap between the score distributions of bad and good loans"""
+        goods, bads = self.good.sum(), self.bad.sum()
+        if not goods or not bads:
+            return None
+        return float(np.abs(np.cumsum(self.bad) / bads - np.cumsum(self.good) / goods).max())
+
+    def result(self):
+        loans, bads = int(self.tier_loans.sum()), int(self.tier_bad.sum())
+        expected, realized = float(self.tier_expected.sum()), float(self.tier_realized.sum())
+        auc, ks = self.auc(), self.ks()
+        tiers = {}
+        for i, name in enumerate(scoring.RISK_CATEGORIES):
+            count = int(self.tier_loans[i])
+            tiers[name] = {
+                "loans": count,
+                "defaults": int(self.tier_bad[i]),
+                "predicted_default_rate": round(self.tier_pd[i] / count, 4) if count else None,
+                "observed_default_rate": round(self.tier_bad[i] / count, 4) if count else None,
+                "loan_amnt": round(float(self.tier_loan_amnt[i]), 2),
+                "expected_loss": round(float(self.tier_expected[i]), 2),
+                "realized_loss": round(float(self.tier_realized[i]), 2),
+                "loss_ratio": round(self.tier_realized[i] / self.tier_expected[i], 4) if self.tier_expected[i] else None
+            }
+        return {
+            "loans": loans,
+            "defaults": bads,
+            "default_rate": round(bads / loans, 4) if loans else None,
+            "auc": None if auc is None else round(auc, 4),
+            "ks": None if ks is None else round(ks, 4),
+            "expected_loss": round(expected, 2),
+            "realized_loss": round(realized, 2),
+            "loss_ratio": round(realized / expected, 4) if expected else None,
+            "tiers": tiers
+        }
+
+
+def score_vintage(cache_dir, year):
+    """Aggregate for one vintage from its cached blocks, in block order"""
+    aggregate = Aggregate()
+    for path in sorted(glob.glob(os.path.join(cache_dir, f"*-{year}.npz"))):
+        with np.load(path) as cached:
+            aggregate.add_loans(cached['fico_range_high'], cached['annual_inc'], cached['loan_amnt'],
+                                cached['bad'], cached['realized_loss'])
+    return aggregate
+
+
+def run(path=ACCEPTED_FILE, workers=WORKERS, cache_dir=CACHE_DIR, nrows=None, rebuild=False,
+        block_bytes=ingestion.BLOCK_BYTES):
+    """Backtest report for an accepted-loans file, reusing the cache when it matches"""
+    started = time.perf_counter()
+    manifest = None if rebuild else load_manifest(cache_dir, _source(path, block_bytes, nrows))
+    cached = manifest is not None
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if manifest is None:
+            manifest = extract(path, cache_dir, pool, workers, block_bytes, nrows)
+        extracted = time.perf_counter()
+        years = [int(year) for year in manifest['vintages']]
+        if pool is None:
+            aggregates = [score_vintage(cache_dir, year) for year in years]
+        else:
+            aggregates = list(pool.map(score_vintage, [cache_dir] * len(years), years))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    overall = Aggregate()
+    vintages = {}
+    for year, aggregate in zip(years, aggregates):
+        overall.add(aggregate)
+        vintages[str(year)] = dict(aggregate.result(), unresolved=manifest['vintages'][str(year)]['unresolved'])
+    finished = time.perf_counter()
+    return {
+        "source": os.path.abspath(path),
+        "rows_read": manifest['rows_read'],
+        "loans": manifest['rows_kept'],
+        "unresolved": sum(counts['unresolved'] for counts in manifest['vintages'].values()),
+        "scoring": scoring.parameters(),
+        "overall": overall.result(),
+        "vintages": vintages,
+        "timings": {
+            "extract_seconds": None if cached else round(extracted - started, 3),
+            "score_seconds": round(finished - extracted, 3),
+            "from_cache": cached
+        }
+    }
+
+
+def _print_report(report):
+    print("=" * 60)
+    print("RISK SCORE BACKTEST")
+    print("=" * 60)
+    timings = report['timings']
+    print(f"\nSource: {report['source']}" + (" (cached extract)" if timings['from_cache'] else ""))
+    print(f"Resolved loans: {report['loans']:,} of {report['rows_read']:,} rows ({report['unresolved']:,} still open)")
+
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    print(f"\n{'Vintage':<8} {'Loans':>10} {'Default':>8} {'AUC':>7} {'KS':>7} {'Loss ratio':>11}")
+    rows = list(report['vintages'].items()) + [("All", report['overall'])]
+    for name, result in rows:
+        print(f"{name:<8} {result['loans']:>10,} {fmt(result['default_rate'], '.2%'):>8} "
+              f"{fmt(result['auc'], '.4f'):>7} {fmt(result['ks'], '.4f'):>7} {fmt(result['loss_ratio'], '.3f'):>11}")
+
+    print("\nCalibration by tier (all vintages):")
+    print(f"{'Tier':<8} {'Loans':>10} {'Predicted':>10} {'Observed':>10} {'Loss ratio':>11}")
+    for name, tier in report['overall']['tiers'].items():
+        print(f"{name:<8} {tier['loans']:>10,} {fmt(tier['predicted_default_rate'], '.2%'):>10} "
+              f"{fmt(tier['observed_default_rate'], '.2%'):>10} {fmt(tier['loss_ratio'], '.3f'):>11}")
+
+    extract_time = "cached" if timings['from_cache'] else f"{timings['extract_seconds']}s"
+    print(f"\nExtract: {extract_time}, score: {timings['score_seconds']}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the risk score against realized loan outcomes")
+    parser.add_argument('path', nargs='?', default=ACCEPTED_FILE, help="Kaggle accepted-loans CSV (.gz)")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes")
+    parser.add_argument('--nrows', type=int, default=None, help="read only the first N rows")
+    parser.add_argument('--cache', default=CACHE_DIR, help="directory for the extracted blocks")
+    parser.add_argument('--rebuild', action='store_true', help="re-extract even if the cache matches")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.path, args.workers, args.cache, args.nrows, args.rebuild)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
@@ -0,0 +1,336 @@
+# Benchmark for Credit Risk API
+# Load-tests the API with realistic mixed traffic and reports throughput and
+# tail latency, sweeping dataset sizes and worker counts:
+#   python benchmark.py --servers inprocess,gunicorn,uvicorn --rows 200,100000,1000000 \
+#       --workers 1,4 --connections 100 --duration 10 --output bench_results.json
+# Results are written as JSON so runs can be compared across commits.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+HOST = '127.0.0.1'
+
+# Command lines for each server; {port} and {workers} are filled in
+SERVERS = {
+    'gunicorn': ['gunicorn', 'app:app', '--bind', f'{HOST}:{{port}}', '--workers', '{workers}'],
+    'uvicorn': ['uvicorn', 'asgi:app', '--host', HOST, '--port', '{port}',
+                '--workers', '{workers}', '--log-level', 'warning'],
+}
+
+# Share of each kind of request in the generated traffic
+TRAFFIC_MIX = {
+    'health': 0.05,
+    'get_data_found': 0.30,
+    'get_data_not_found': 0.05,
+    'risk_score': 0.25,
+    'calc_ecl': 0.25,
+    'invalid': 0.10,
+}
+
+# Bad requests taken from FAILURE_TEST_CASES.md
+INVALID_REQUESTS = [
+    ('/get_data', {'member_id': 'abc'}),                                   # 1.2
+    ('/get_data', {}),                                                     # missing member_id
+    ('/risk_score', {'fico_range_high': 'excellent', 'annual_inc': 60000}),  # 2.4
+    ('/risk_score', {'fico_range_high': 700, 'annual_inc': -50000}),       # 3.1
+    ('/risk_score', {'annual_inc': 50000}),                                # 6.1
+    ('/risk_score', {'fico_range_high': 'seven hundred',
+                     'annual_inc': 'fifty thousand dollars'}),             # 10.1
+    ('/calc_ecl', {'loan_amnt': -10000, 'risk_score': 30}),                # 4.1
+    ('/calc_ecl', {'loan_amnt': 15000, 'risk_score': 150}),                # 5.1
+    ('/calc_ecl', {'loan_amnt': 20000, 'risk_score': -25}),                # 5.2
+]
+
+
+def free_port():
+    """An unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, workers, env=None, timeout=600):
+    """Launch a server in a subprocess and wait until /health answers"""
+    port = free_port()
+    cmd = [arg.format(port=port, workers=workers) for arg in SERVERS[name]]
+    proc = subprocess.Popen(cmd, env={**os.environ, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(f"http://{HOST}:{port}/health", timeout=1)
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{name} did not come up within {timeout}s")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def make_dataset(rows, seed=0):
+    """Write a synthetic borrower table of `rows` rows as a snapshot
+
+    Returns (snapshot_dir, member_ids); the caller removes the directory.
+    """
+    import snapshot
+
+    rng = np.random.default_rng(seed)
+    member_ids = rng.permutation(np.arange(1, rows + 1, dtype=np.int64) * 7)
+    df = pd.DataFrame({
+        'member_id': member_ids,
+        'loan_amnt': rng.integers(1000, 40000, rows).astype(float),
+        'annual_inc': rng.lognormal(11, 0.5, rows).round(0),
+        'fico_range_high': rng.integers(300, 851, rows).astype(float),
+        'loan_status': rng.choice(['Fully Paid', 'Charged Off', 'Declined'], rows),
+    })
+    path = tempfile.mkdtemp(prefix='bench_snapshot_')
+    snapshot.write_snapshot(df, path)
+    return path, member_ids
+
+
+def build_requests(member_ids, count=5000, seed=0):
+    """Sample `count` requests following TRAFFIC_MIX; returns [(kind, method, path, body)]"""
+    rng = random.Random(seed)
+    known = [int(x) for x in rng.sample(list(member_ids), min(1000, len(member_ids)))]
+    kinds = rng.choices(list(TRAFFIC_MIX), weights=list(TRAFFIC_MIX.values()), k=count)
+    requests = []
+    for kind in kinds:
+        if kind == 'health':
+            requests.append((kind, 'GET', '/health', None))
+        elif kind == 'get_data_found':
+            requests.append((kind, 'POST', '/get_data', {'member_id': rng.choice(known)}))
+        elif kind == 'get_data_not_found':
+            requests.append((kind, 'POST', '/get_data', {'member_id': -rng.randint(10**9, 10**10)}))
+        elif kind == 'risk_score':
+            requests.append((kind, 'POST', '/risk_score', {
+                'fico_range_high': rng.randint(300, 850), 'annual_inc': rng.randint(10000, 200000)}))
+        elif kind == 'calc_ecl':
+            requests.append((kind, 'POST', '/calc_ecl', {
+                'loan_amnt': rng.randint(1000, 40000), 'risk_score': round(rng.uniform(0, 100), 2)}))
+        else:
+            path, body = rng.choice(INVALID_REQUESTS)
+            requests.append((kind, 'POST', path, body))
+    return requests
+
+
+def summarize(latencies, statuses, elapsed):
+    """Throughput and latency percentiles (ms) for one run"""
+    summary = {
+        'requests': sum(len(v) for v in latencies.values()),
+        'seconds': round(elapsed, 3),
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        'by_kind': {},
+    }
+    summary['requests_per_second'] = round(summary['requests'] / elapsed, 1)
+    everything = [x for values in latencies.values() for x in values]
+    summary.update(_percentiles(everything))
+    for kind, values in sorted(latencies.items()):
+        summary['by_kind'][kind] = {'requests': len(values), **_percentiles(values)}
+    return summary
+
+
+def _percentiles(values):
+    if not values:
+        return {'mean_ms': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+    }
+
+
+# --- HTTP load generator ---
+
+def _encode(method, path, body):
+    payload = b'' if body is None else json.dumps(body).encode()
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n")
+    return head.encode() + payload
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length = 0
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def _client(port, payloads, deadline, latencies, statuses, seed):
+    """One keep-alive connection sending requests back to back until deadline"""
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(HOST, port)
+            kind, payload = rng.choice(payloads)
+            start = time.perf_counter()
+            writer.write(payload)
+            status, keep_alive = await _read_response(reader)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            statuses['connection_error'] = statuses.get('connection_error', 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(port, requests, connections, duration):
+    """Drive a server with `connections` concurrent clients for `duration` seconds"""
+    payloads = [(kind, _encode(method, path, body)) for kind, method, path, body in requests]
+    latencies = {}
+    statuses = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _client(port, payloads, deadline, latencies, statuses, seed)
+        for seed in range(connections)
+    ))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def run_inprocess(requests, duration, snapshot_dir):
+    """Same traffic through the Flask test client: no sockets, one request at a time"""
+    import app
+    import log_config
+
+    # Log to /dev/null like the server runs, so logging is still paid for
+    log_config.set_stream(open(os.devnull, 'w'))
+
+    # Point the app at the benchmark dataset via the hot-reload path
+    app.SNAPSHOT_DIR = snapshot_dir
+    app.reload_borrowers()
+    client = app.app.test_client()
+
+    rng = random.Random(0)
+    latencies = {}
+    statuses = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        kind, method, path, body = rng.choice(requests)
+        t0 = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Credit Risk API")
+    parser.add_argument('--servers', default='inprocess,gunicorn',
+                        help="comma list of inprocess, gunicorn, uvicorn")
+    parser.add_argument('--rows', default='200,100000',
+                        help="comma list of synthetic dataset sizes")
+    parser.add_argument('--workers', default='1,2', help="comma list of worker counts")
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--env', action='append', default=[],
+                        help="KEY=VALUE passed to the app, e.g. RESPONSE_CACHE_SIZE=0")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    env = dict(item.split('=', 1) for item in args.env)
+    os.environ.update(env)
+    servers = args.servers.split(',')
+    row_counts = [int(x) for x in args.rows.split(',')]
+    worker_counts = [int(x) for x in args.workers.split(',')]
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {**vars(args), 'env': env, 'traffic_mix': TRAFFIC_MIX},
+        'runs': [],
+    }
+
+    for rows in row_counts:
+        print(f"Building synthetic dataset with {rows} rows...")
+        snapshot_dir, member_ids = make_dataset(rows)
+        requests = build_requests(member_ids)
+        try:
+            for server in servers:
+                for workers in ([1] if server == 'inprocess' else worker_counts):
+                    print(f"  {server}, {workers} workers...")
+                    if server == 'inprocess':
+                        result = run_inprocess(requests, args.duration, snapshot_dir)
+                    else:
+                        proc, port = start_server(server, workers, {'BORROWERS_SNAPSHOT': snapshot_dir})
+                        try:
+                            result = asyncio.run(run_load(port, requests, args.connections, args.duration))
+                        finally:
+                            stop_server(proc)
+                    result.update({'server': server, 'rows': rows, 'workers': workers,
+                                   'connections': 1 if server == 'inprocess' else args.connections})
+                    report['runs'].append(result)
+                    print(f"    {result['requests_per_second']} req/s, p50 {result['p50_ms']} ms, "
+                          f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+        finally:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(report['runs'])} runs to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
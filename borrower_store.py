@@ -0,0 +1,456 @@
+# Borrower Store for Credit Risk API
+# Indexes the borrower table by member_id so lookups don't scan the DataFrame
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import scoring
+
+
+# Compact storage dtype and JSON type per borrower column. Integer dtypes
+# need whole values in range; float32 is used only where every value
+# survives the round trip, otherwise the column stays float64. The JSON
+# type is a default: responses keep the type the source column was parsed
+# as (see json_types), so 709 stays 709 and 709.0 stays 709.0.
+SCHEMA = {
+    'member_id': ('int32', int),
+    'loan_amnt': ('float32', float),
+    'annual_inc': ('float32', float),
+    'fico_range_high': ('uint16', float),
+    'loan_status': ('category', str),
+}
+
+# Wider fallbacks, in order, when the compact dtype can't hold the data
+# exactly (e.g. FICO estimated from rejected applications is fractional)
+WIDE_DTYPES = {'int32': ('int64',), 'float32': ('float64',), 'uint16': ('float32', 'float64')}
+
+# member_ids outside this range can't be stored, so never match
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+
+def _fits(values, dtype):
+    """True if values convert to dtype and back without change"""
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        if np.isnan(values).any() or (values != np.floor(values)).any():
+            return False
+        info = np.iinfo(dtype)
+        return len(values) == 0 or (values.min() >= info.min and values.max() <= info.max)
+    return np.array_equal(values.astype(dtype).astype(values.dtype), values, equal_nan=True)
+
+
+def compact_frame(df):
+    """Cast the schema columns of df to their compact dtypes
+
+    Raises ValueError if a numeric column holds non-numeric values or an
+    integer column can't be stored exactly even in its wide fallback.
+    """
+    casts = {}
+    for col, (dtype, _) in SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category':
+            casts[col] = 'category'
+            continue
+        if not pd.api.types.is_numeric_dtype(df[col].dtype):
+            raise ValueError(f"{col} must be numeric, got {df[col].dtype}")
+        values = df[col].to_numpy(dtype='float64')
+        for candidate in (dtype,) + WIDE_DTYPES.get(dtype, ()):
+            if _fits(values, candidate):
+                casts[col] = candidate
+                break
+        else:
+            raise ValueError(f"{col} does not fit {dtype}: expected whole numbers in range")
+    return df.astype(casts)
+
+
+def json_types(df):
+    """'int' or 'float' per numeric SCHEMA column of df, as it was parsed
+
+    Taken before compact_frame changes the dtypes, and stored with
+    snapshots, so responses return numbers the way the source had them.
+    """
+    return {
+        col: 'int' if df[col].dtype.kind in 'iu' else 'float'
+        for col, (_, json_type) in SCHEMA.items()
+        if col in df.columns and json_type is not str and pd.api.types.is_numeric_dtype(df[col].dtype)
+    }
+
+
+def check_dtypes(arrays):
+    """Validate already-typed columns (e.g. from a snapshot) against SCHEMA
+
+    Only the kind is checked, so snapshots written before the compact
+    schema still load.
+    """
+    for col, (dtype, _) in SCHEMA.items():
+        if col not in arrays:
+            continue
+        actual = arrays[col].dtype
+        if dtype == 'category':
+            if pd.api.types.is_numeric_dtype(actual):
+                raise ValueError(f"{col} must hold labels, got {actual}")
+        elif col == 'member_id':
+            if actual.kind not in 'iu':
+                raise ValueError(f"{col} must be integers, got {actual}")
+        elif actual.kind not in 'iuf':
+            raise ValueError(f"{col} must be numeric, got {actual}")
+
+
+def to_native(val):
+    """Convert a numpy/pandas scalar to a JSON-ready python value"""
+    if pd.isna(val):
+        return None
+    if hasattr(val, 'item'):  # numpy types
+        return val.item()
+    return val
+
+
+def column_array(series):
+    """Backing array for a column; categoricals stay as codes + categories"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array
+    return series.to_numpy()
+
+
+class SortedIndex:
+    """member_id -> row position by binary search over sorted arrays
+
+    Unlike a dict it needs no per-process build step, so it can be loaded
+    straight from a memory-mapped snapshot.
+    """
+
+    def __init__(self, ids, positions):
+        self.ids = ids
+        self.positions = positions
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Build from an unsorted member_id column; the first duplicate wins"""
+        order = np.argsort(ids, kind='stable')
+        return cls(np.asarray(ids)[order], order.astype(np.int64))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, member_id):
+        return self.get(member_id) is not None
+
+    def get(self, member_id, default=None):
+        i = np.searchsorted(self.ids, member_id)
+        if i < len(self.ids) and self.ids[i] == member_id:
+            return int(self.positions[i])
+        return default
+
+    def get_many(self, member_ids):
+        """Row positions of member_ids (-1 where unknown), in one searchsorted pass"""
+        member_ids = list(member_ids)
+        # Beyond 64 bits can't be a stored id (and can't go in an int64 array)
+        in_range = np.array([INT64_MIN <= member_id <= INT64_MAX for member_id in member_ids], dtype=bool)
+        keys = np.array([member_id if ok else 0 for member_id, ok in zip(member_ids, in_range)], dtype=np.int64)
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.ids):
+            return positions
+        found = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        hit = in_range & (np.asarray(self.ids[found]) == keys)
+        positions[hit] = np.asarray(self.positions)[found[hit]]
+        return positions
+
+
+class RecordCache:
+    """Thread-safe LRU of per-member values (records, encoded bodies)"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class CachedStore:
+    """Lookup API shared by the storage backends (BorrowerStore, SqliteStore)
+
+    Subclasses set columns / score_columns and implement __len__ and
+    _load_record(member_id); records and encoded response bodies are kept
+    in least-recently-used caches of max_cached entries each. columnar is
+    True when whole columns are available as arrays (store.array), which
+    /query and the fast portfolio summary need.
+    """
+
+    columnar = False
+
+    def __init__(self, max_cached):
+        self.max_cached = max_cached
+        self._records = RecordCache(max_cached)
+        self._encoded = RecordCache(max_cached)
+
+        # Where the data came from and which reload produced it (see app.py)
+        self.source = None
+        self.version = 0
+        self.loaded_at = time.time()
+        self.load_seconds = None
+
+    def _load_record(self, member_id):
+        raise NotImplementedError
+
+    def __contains__(self, member_id):
+        return self.get(member_id) is not None
+
+    def get(self, member_id):
+        """Return the JSON-ready record for member_id, or None if not found
+
+        The record holds the table columns plus the precomputed score columns.
+        """
+        record = self._records.get(member_id)
+        if record is None:
+            record = self._load_record(member_id)
+            if record is None:
+                return None
+            self._records.put(member_id, record)
+        return record
+
+    def _load_records(self, member_ids):
+        """{member_id: record} for the known ones; subclasses answer in one pass"""
+        records = {}
+        for member_id in member_ids:
+            record = self._load_record(member_id)
+            if record is not None:
+                records[member_id] = record
+        return records
+
+    def get_many(self, member_ids):
+        """get() for each of member_ids, loading every uncached one in a single pass"""
+        records = {member_id: self._records.get(member_id) for member_id in member_ids}
+        missing = [member_id for member_id, record in records.items() if record is None]
+        if missing:
+            for member_id, record in self._load_records(missing).items():
+                self._records.put(member_id, record)
+                records[member_id] = record
+        return [records[member_id] for member_id in member_ids]
+
+    def get_encoded_many(self, member_ids, encode):
+        """get_encoded() for each of member_ids; records for the uncached bodies come from get_many"""
+        bodies = {member_id: self._encoded.get(member_id) for member_id in member_ids}
+        missing = [member_id for member_id, body in bodies.items() if body is None]
+        for member_id, record in zip(missing, self.get_many(missing)):
+            if record is not None:
+                bodies[member_id] = encode(record)
+                self._encoded.put(member_id, bodies[member_id])
+        return [bodies[member_id] for member_id in member_ids]
+
+    def get_encoded(self, member_id, encode):
+        """encode(record) for member_id, cached, or None if not found
+
+        Lets a handler keep the serialized response body per member, so a
+        repeat lookup skips building and serializing the dict.
+        """
+        body = self._encoded.get(member_id)
+        if body is None:
+            record = self.get(member_id)
+            if record is None:
+                return None
+            body = encode(record)
+            self._encoded.put(member_id, body)
+        return body
+
+
+class BorrowerStore(CachedStore):
+    """Columnar borrower table indexed by member_id
+
+    The index is a dict (O(1)) when built in-process, or a SortedIndex when
+    loaded from a snapshot. Risk score, category and ECL are computed for
+    every row in one vectorized pass when the store is built, so lookups
+    return precomputed values.
+    """
+
+    columnar = True
+
+    def __init__(self, arrays, columns, index=None, max_cached=100000, json_types=None, sort_indexes=None):
+        super().__init__(max_cached)
+        self.columns = list(columns)
+        # Prebuilt {column: (order, sorted values)} for query_index, e.g. from a snapshot
+        self.sort_indexes = dict(sort_indexes or {})
+
+        # One contiguous array per column instead of a row-oriented frame
+        self._arrays = dict(arrays)
+        check_dtypes(self._arrays)
+        # Compact storage must not leak into responses as a different JSON
+        # type: columns whose source type (json_types, else SCHEMA's) differs
+        # from the stored dtype's are converted back per value
+        self._json_types = {}
+        for col in self.columns:
+            if col not in SCHEMA or SCHEMA[col][1] is str:
+                continue
+            wanted = {'int': int, 'float': float}[json_types[col]] if col in (json_types or {}) else SCHEMA[col][1]
+            stored = int if self._arrays[col].dtype.kind in 'iu' else float
+            if wanted is not stored:
+                self._json_types[col] = wanted
+
+        # Precompute scoring columns where the inputs are present, unless
+        # they were handed in already (e.g. from a snapshot)
+        self.score_columns = []
+        if all(col in self._arrays for col in scoring.SCORE_COLUMNS):
+            self.score_columns = list(scoring.SCORE_COLUMNS)
+        elif {'fico_range_high', 'annual_inc', 'loan_amnt'} <= set(self.columns):
+            scores, categories, losses = scoring.score_arrays(
+                np.asarray(self._arrays['fico_range_high'], dtype=float),
+                np.asarray(self._arrays['annual_inc'], dtype=float),
+                np.asarray(self._arrays['loan_amnt'], dtype=float)
+            )
+            self._arrays['risk_score'] = scores
+            self._arrays['risk_category'] = pd.Categorical(categories, categories=scoring.RISK_CATEGORIES)
+            self._arrays['expected_credit_loss'] = losses
+            self.score_columns = list(scoring.SCORE_COLUMNS)
+
+        if index is None:
+            # member_id -> row position; walk backwards so the first duplicate
+            # wins, matching the old df[df['member_id'] == id].iloc[0] behaviour
+            ids = np.asarray(self._arrays['member_id']).tolist()
+            index = {}
+            for pos in range(len(ids) - 1, -1, -1):
+                index[int(ids[pos])] = pos
+        self._index = index
+
+    @classmethod
+    def from_frame(cls, df, shared=False, **kwargs):
+        """Build a store from a borrower DataFrame, cast to the compact SCHEMA
+
+        With shared=True the store holds no per-row Python objects: strings
+        become categorical codes and the index is a SortedIndex instead of a
+        dict. Built in a preloading gunicorn master, its pages then stay
+        shared with every forked worker, since refcount updates never touch
+        the numpy buffers.
+        """
+        kwargs.setdefault('json_types', json_types(df))
+        df = compact_frame(df)
+        if shared:
+            df = df.astype({
+                col: 'category' for col in df.columns
+                if not pd.api.types.is_numeric_dtype(df[col].dtype)
+            })
+            kwargs.setdefault('index', SortedIndex.from_ids(df['member_id'].to_numpy()))
+        arrays = {col: column_array(df[col]) for col in df.columns}
+        return cls(arrays, df.columns, **kwargs)
+
+    def __len__(self):
+        return len(self._arrays['member_id'])
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column arrays (memory-mapped pages included)"""
+        return sum(getattr(values, 'nbytes', 0) for values in self._arrays.values())
+
+    def __contains__(self, member_id):
+        return member_id in self._index
+
+    def array(self, column):
+        """Backing array for a table or score column"""
+        return self._arrays[column]
+
+    def position(self, member_id):
+        """Row position for member_id, or None if unknown"""
+        return self._index.get(member_id)
+
+    def record_at(self, pos):
+        """JSON-ready record for the row at position pos (not cached)"""
+        record = {
+            col: to_native(self._arrays[col][pos])
+            for col in self.columns + self.score_columns
+        }
+        for col, json_type in self._json_types.items():
+            if record[col] is not None:
+                record[col] = json_type(record[col])
+        return record
+
+    def column_values(self, column, start, stop):
+        """JSON-ready values of column for rows [start, stop), as record_at gives them
+
+        Converts a whole block at once (missing values become None), for
+        exporting many rows without building them one by one.
+        """
+        return self._native_values(column, self._arrays[column][start:stop])
+
+    def _native_values(self, column, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            labels = np.asarray(values.categories, dtype=object)
+            codes = np.asarray(values.codes)
+            if not len(labels):
+                return [None] * len(codes)
+            out = labels[np.maximum(codes, 0)]
+            out[codes < 0] = None
+            return out.tolist()
+        if values.dtype.kind == 'O':
+            return [to_native(val) for val in values]
+        if values.dtype.kind in 'iu':
+            return values.astype(float).tolist() if column in self._json_types else values.tolist()
+        if self._json_types.get(column) is int:
+            # Integer source held as float (e.g. a negative FICO); never NaN
+            return values.astype(np.int64).tolist()
+        out = values.astype(float).astype(object)
+        out[np.isnan(values)] = None
+        return out.tolist()
+
+    def _load_record(self, member_id):
+        pos = self._index.get(member_id)
+        return None if pos is None else self.record_at(pos)
+
+    def _load_records(self, member_ids):
+        if not isinstance(self._index, SortedIndex):
+            # A dict index is already one hash lookup per id
+            return super()._load_records(member_ids)
+        positions = self._index.get_many(member_ids)
+        hit = positions >= 0
+        columns = self.columns + self.score_columns
+        rows = zip(*(self._native_values(col, self._arrays[col][positions[hit]]) for col in columns))
+        found = [member_id for member_id, ok in zip(member_ids, hit.tolist()) if ok]
+        return {member_id: dict(zip(columns, row)) for member_id, row in zip(found, rows)}
+
+    def _matcher(self, column, wanted):
+        """Function (start, stop) -> mask of rows whose column label is in wanted"""
+        values = self._arrays[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Compare integer codes instead of strings
+            codes = np.asarray(values.codes)
+            wanted_codes = [values.categories.get_loc(label) for label in wanted if label in values.categories]
+            return lambda start, stop: np.isin(codes[start:stop], wanted_codes)
+        return lambda start, stop: np.isin(np.asarray(values[start:stop], dtype=object), list(wanted))
+
+    def iter_rows(self, filters=None, block_rows=10000):
+        """Yield (columns, rows) per block of block_rows, rows as tuples of JSON-ready values
+
+        filters maps a label column (e.g. loan_status, risk_category) to
+        the labels to keep; blocks without a matching row are skipped.
+        """
+        columns = self.columns + self.score_columns
+        matchers = [self._matcher(column, wanted) for column, wanted in (filters or {}).items()]
+        for start in range(0, len(self), block_rows):
+            stop = min(start + block_rows, len(self))
+            keep = None
+            for match in matchers:
+                mask = match(start, stop)
+                keep = mask if keep is None else keep & mask
+            if keep is not None and not keep.any():
+                continue
+            rows = zip(*(self.column_values(column, start, stop) for column in columns))
+            if keep is not None:
+                rows = (row for row, kept in zip(rows, keep.tolist()) if kept)
+            yield columns, rows
@@ -0,0 +1,150 @@
+# Request Coalescer for Credit Risk API
+# Groups concurrent single-item calls into one batch call, so many
+# one-borrower requests share a single vectorized pass
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+def _on_event_loop():
+    """True when called from a thread running an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class Coalescer:
+    """Runs submit(item) calls from many threads as handler(items) batches
+
+    A worker thread takes the first waiting item, keeps collecting for
+    `window` seconds after it arrived or until max_batch items are queued,
+    then calls handler once with the whole list. handler must return one
+    result per item, in order; each caller gets its own result back. If
+    the batch call fails, the items are retried one at a time, so each
+    caller gets its own result or exception. A window of 0 disables coalescing: submit()
+    then calls single(item), or handler([item]) if no single is given.
+
+    Only helps when requests arrive concurrently in one process, i.e.
+    under a threaded server (gunicorn --threads, Flask's dev server, or
+    asgi.py's thread pool). A submit() from an event loop thread is never
+    queued: waiting for the window there would stall every connection, so
+    it is run directly, with a warning the first time.
+    """
+
+    def __init__(self, name, handler, single=None, window=0.0, max_batch=256, batch_sizes=None, queue_delay=None):
+        self.name = name
+        self.handler = handler
+        self.single = single
+        self.window = window
+        self.max_batch = max_batch
+        # Optional metrics.Histogram pair, labelled with name
+        self.batch_sizes = batch_sizes
+        self.queue_delay = queue_delay
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self._delay_total = 0.0
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._warned = False
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch > 1
+
+    def submit(self, item):
+        """handler's result for item, computed in a batch with concurrent calls"""
+        if not self.enabled or _on_event_loop():
+            if self.enabled and not self._warned:
+                self._warned = True
+                logger.warning("Coalescer %s called on an event loop; running items one by one", self.name)
+            return self.single(item) if self.single is not None else self.handler([item])[0]
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((time.monotonic(), item, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Threads don't survive a fork; start one per process on first use
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._worker = threading.Thread(target=self._run, name=f"coalescer-{self.name}", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = batch[0][0] + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            self._record(len(batch), [started - enqueued for enqueued, _, _ in batch])
+            try:
+                results = self.handler([item for _, item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} handler returned {len(results)} results for {len(batch)} items")
+            except Exception:
+                # Retry one by one, so a bad item fails only its own caller
+                for _, item, future in batch:
+                    self._run_single(item, future)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run_single(self, item, future):
+        try:
+            result = self.single(item) if self.single is not None else self.handler([item])[0]
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _record(self, size, delays):
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.largest = max(self.largest, size)
+            self._delay_total += sum(delays)
+        if self.batch_sizes is not None:
+            self.batch_sizes.observe(size, self.name)
+        if self.queue_delay is not None:
+            for delay in delays:
+                self.queue_delay.observe(delay, self.name)
+
+    def stats(self):
+        """Counters for /health"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest,
+                "mean_queue_delay_ms": round(self._delay_total / self.items * 1000, 4) if self.items else 0.0
+            }
@@ -0,0 +1,26 @@
+# Gunicorn configuration for Credit Risk API
+# Read automatically by `gunicorn app:app` (Procfile, render.yaml)
+
+import gc
+import os
+
+# Load app.py (and the borrower table) once in the master, then fork the
+# workers so they share its memory instead of each loading their own copy.
+# Snapshots are memory-mapped and shared through the page cache either way.
+# Set SHARED_DATASET=0 to load the data separately in every worker.
+preload_app = os.environ.get('SHARED_DATASET', '1') == '1'
+
+
+def when_ready(server):
+    """Freeze the preloaded heap so the garbage collector leaves its pages shared"""
+    if preload_app:
+        gc.freeze()
+        server.log.info("Borrower table preloaded; workers will share it")
+
+
+def post_fork(server, worker):
+    """Start the per-worker threads (threads don't survive fork): log writer and dataset watcher"""
+    import app
+    import log_config
+    log_config.after_fork()
+    app.start_dataset_watcher()
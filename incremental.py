@@ -0,0 +1,88 @@
+# Incremental Ingestion Checkpoints
+# Remembers how far each Kaggle source file has been read, so the next run
+# only parses rows appended since then
+
+import gzip
+import hashlib
+import json
+import os
+
+CHECKPOINT_FILE = 'ingest_checkpoint.json'
+CHECKPOINT_FORMAT = 1
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def content_hash(path, offset, block_size=1024 * 1024):
+    """sha256 of the first offset bytes of the (decompressed) file
+
+    Appending rows leaves it unchanged; rewriting the already-read part
+    changes it. Reaching offset in a gzip file means decompressing up to it
+    anyway, so hashing on the way costs little next to parsing the rows.
+    """
+    digest = hashlib.sha256()
+    remaining = offset
+    with _open(path) as f:
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def file_hash(path, block_size=1024 * 1024):
+    """sha256 of a whole (small) file, e.g. the borrowers.csv a checkpoint produced"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(path=CHECKPOINT_FILE):
+    """The saved checkpoint, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    return checkpoint if checkpoint.get('format') == CHECKPOINT_FORMAT else None
+
+
+def save(checkpoint, path=CHECKPOINT_FILE):
+    """Write the checkpoint atomically (temp file + rename)"""
+    checkpoint = dict(checkpoint, format=CHECKPOINT_FORMAT)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def file_entry(path, offset, rows, digest=None):
+    """Checkpoint entry for a source file read up to offset (rows records)
+
+    digest is the content hash of that prefix if the read already computed
+    it (see ingestion.iter_blocks); otherwise the prefix is hashed here.
+    """
+    return {
+        'path': os.path.abspath(path),
+        'offset': offset,
+        'rows': rows,
+        'hash': digest if digest is not None else content_hash(path, offset)
+    }
+
+
+def resume_point(entry, path):
+    """(offset, first_row, prefix_hash) to continue path from, or None if it can't be resumed
+
+    A file can be resumed when it is the same file the entry describes.
+    Whether the content before the recorded offset is unchanged is checked
+    by the resumed read itself, which has to decompress that far anyway
+    (ingestion.iter_blocks raises PrefixChanged).
+    """
+    if entry is None or entry.get('path') != os.path.abspath(path) or not os.path.exists(path):
+        return None
+    return entry['offset'], entry['rows'], entry['hash']
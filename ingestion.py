@@ -0,0 +1,376 @@
+# Streaming Lending Club Ingestion
+# Reads the Kaggle files in chunks, keeping only the columns the API uses,
+# so peak memory depends on the chunk size rather than the file size
+
+import gzip
+import hashlib
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ACCEPTED_FILE = './kaggle_data/accepted_2007_to_2018Q4.csv.gz'
+REJECTED_FILE = './kaggle_data/rejected_2007_to_2018Q4.csv.gz'
+CHUNK_SIZE = 100000
+# Bytes of decompressed CSV handed to a worker at a time (parallel reads)
+BLOCK_BYTES = 16 * 1024 * 1024
+
+# Schema of borrowers.csv
+OUTPUT_COLUMNS = ['member_id', 'loan_amnt', 'annual_inc', 'fico_range_high', 'loan_status']
+NUMERIC_COLUMNS = ['member_id', 'loan_amnt', 'annual_inc', 'fico_range_high']
+
+# Accepted loans: Kaggle column -> API column
+ACCEPTED_MAP = {
+    'id': 'member_id',
+    'member_id': 'member_id',
+    'loan_amnt': 'loan_amnt',
+    'annual_inc': 'annual_inc',
+    'fico_range_high': 'fico_range_high',
+    'loan_status': 'loan_status'
+}
+
+# 'id' is read as text: the accepted file ends with summary lines in that column
+ACCEPTED_DTYPES = {
+    'id': str,
+    'member_id': 'float64',
+    'loan_amnt': 'float32',
+    'annual_inc': 'float64',
+    'fico_range_high': 'float32',
+    'loan_status': 'category'
+}
+
+REJECTED_DTYPES = {
+    'Amount Requested': 'float32',
+    'Risk_Score': 'float32',
+    'Debt-To-Income Ratio': str
+}
+
+
+def read_header(path):
+    """Column names of a (possibly gzipped) CSV without reading any rows"""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def accepted_usecols(header):
+    """Columns to read from an accepted-loans file, preferring 'id' over 'member_id'"""
+    usecols = [col for col in ACCEPTED_MAP if col in header]
+    if 'id' in usecols and 'member_id' in usecols:
+        usecols.remove('member_id')
+    return usecols
+
+
+def map_accepted(chunk):
+    """Rename an accepted-loans chunk to the API schema"""
+    chunk = chunk.rename(columns=ACCEPTED_MAP)
+    if 'loan_status' not in chunk.columns:
+        chunk['loan_status'] = pd.Categorical(['Fully Paid'] * len(chunk))
+    return chunk.reindex(columns=OUTPUT_COLUMNS)
+
+
+def map_rejected(chunk, first_row, rng=None):
+    """Map a rejected-loans chunk to the API schema
+
+    first_row is the chunk's offset in the file; rejected applicants get
+    member_id -(row + 1) so IDs are stable however the file is chunked.
+    """
+    out = pd.DataFrame(index=chunk.index)
+    out['member_id'] = -(first_row + np.arange(1, len(chunk) + 1))
+    out['loan_amnt'] = chunk['Amount Requested']
+
+    # Estimate annual income from debt-to-income ratio if available
+    if 'Debt-To-Income Ratio' in chunk.columns:
+        # Parse DTI (format: "27.65%")
+        dti = chunk['Debt-To-Income Ratio'].str.rstrip('%').astype(float) / 100
+        # Estimate income: loan_amnt / DTI (rough approximation)
+        out['annual_inc'] = (chunk['Amount Requested'] / dti).clip(upper=500000)
+    else:
+        # Fallback: estimate based on loan amount (loan is typically 0.5-2x annual income)
+        rng = rng if rng is not None else np.random.default_rng()
+        out['annual_inc'] = chunk['Amount Requested'] * rng.uniform(0.8, 2.5, len(chunk))
+
+    # Use Risk_Score to estimate FICO (higher risk = lower FICO)
+    if 'Risk_Score' in chunk.columns:
+        out['fico_range_high'] = ((100 - chunk['Risk_Score']) * 6 + 300).clip(300, 850)
+    else:
+        out['fico_range_high'] = np.nan
+
+    out['loan_status'] = pd.Categorical(['Declined'] * len(chunk))
+    return out
+
+
+def clean(df):
+    """Drop incomplete or out-of-range rows and fix column types"""
+    df = df.dropna(subset=NUMERIC_COLUMNS)
+
+    # Convert types; anything that fails becomes NaN and is dropped below
+    df = df.assign(**{
+        col: pd.to_numeric(df[col], errors='coerce') for col in NUMERIC_COLUMNS
+    })
+    df = df.dropna()
+
+    # Filter for reasonable values
+    df = df[
+        (df['fico_range_high'] >= 300) &
+        (df['fico_range_high'] <= 850) &
+        (df['annual_inc'] > 0) &
+        (df['annual_inc'] < 10000000) &  # Remove outliers
+        (df['loan_amnt'] > 0)
+    ]
+    return df.astype({'member_id': 'int64'})
+
+
+def iter_accepted(path=ACCEPTED_FILE, chunksize=CHUNK_SIZE, nrows=None):
+    """Yield accepted loans in the API schema, one uncleaned chunk at a time"""
+    usecols = accepted_usecols(read_header(path))
+    dtypes = {col: ACCEPTED_DTYPES[col] for col in usecols}
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize, nrows=nrows)
+    with reader:
+        for chunk in reader:
+            yield map_accepted(chunk)
+
+
+def iter_rejected(path=REJECTED_FILE, chunksize=CHUNK_SIZE, nrows=None, seed=None):
+    """Yield rejected applications in the API schema, one uncleaned chunk at a time"""
+    header = read_header(path)
+    if 'Amount Requested' not in header:
+        return
+    usecols = [col for col in REJECTED_DTYPES if col in header]
+    dtypes = {col: REJECTED_DTYPES[col] for col in usecols}
+    rng = np.random.default_rng(seed)
+
+    first_row = 0
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize, nrows=nrows)
+    with reader:
+        for chunk in reader:
+            yield map_rejected(chunk, first_row, rng)
+            first_row += len(chunk)
+
+
+def clean_chunks(chunks, stats=None):
+    """Clean each chunk as it streams past, counting rows in and out"""
+    for chunk in chunks:
+        cleaned = clean(chunk)
+        if stats is not None:
+            stats['rows_read'] = stats.get('rows_read', 0) + len(chunk)
+            stats['rows_kept'] = stats.get('rows_kept', 0) + len(cleaned)
+        yield cleaned
+
+
+def concat_chunks(chunks):
+    """Concatenate cleaned chunks, keeping loan_status categorical across them"""
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    status = union_categoricals([chunk['loan_status'].astype('category') for chunk in chunks])
+    df = pd.concat([chunk.drop(columns='loan_status') for chunk in chunks], ignore_index=True)
+    df['loan_status'] = status
+    return df[OUTPUT_COLUMNS]
+
+
+def read_accepted(path=ACCEPTED_FILE, chunksize=CHUNK_SIZE, nrows=None, stats=None):
+    """Stream, clean and collect an accepted-loans file"""
+    return concat_chunks(clean_chunks(iter_accepted(path, chunksize, nrows), stats))
+
+
+def read_rejected(path=REJECTED_FILE, chunksize=CHUNK_SIZE, nrows=None, stats=None, seed=None):
+    """Stream, clean and collect a rejected-loans file"""
+    return concat_chunks(clean_chunks(iter_rejected(path, chunksize, nrows, seed), stats))
+
+
+# --- Parallel ingestion ---
+# The main process decompresses each file and cuts it into line-aligned
+# blocks; a process pool parses, maps and cleans the blocks. Results are
+# collected in file order, so the output doesn't depend on the worker count.
+
+def _complete_records(data):
+    """(end, count): offset just past the last complete record in data, and
+    the number of records before it. Newlines inside quoted fields don't end
+    a record."""
+    if b'"' not in data:
+        end = data.rfind(b'\n') + 1
+        return end, data.count(b'\n', 0, end)
+    end = count = pos = 0
+    in_quotes = False
+    while True:
+        newline = data.find(b'\n', pos)
+        if newline < 0:
+            return end, count
+        if data.count(b'"', pos, newline) % 2:
+            in_quotes = not in_quotes
+        pos = newline + 1
+        if not in_quotes:
+            end = pos
+            count += 1
+
+
+class PrefixChanged(ValueError):
+    """The part of a file a resumed read skips is not what the checkpoint saw"""
+
+
+def iter_blocks(path, block_bytes=BLOCK_BYTES, nrows=None, offset=None, first_row=0,
+                digest=None, prefix_hash=None):
+    """Yield (header, first_row, data, rows) for record-aligned pieces of a (gzipped) CSV
+
+    first_row is the number of data records before the piece, so rows keep
+    the numbering of a sequential read. offset/first_row resume a previous
+    read: offset is a position in the decompressed stream just after a
+    complete record, e.g. from an ingestion checkpoint.
+
+    digest, a hashlib object, is fed every byte up to the end of each
+    yielded piece, so its hexdigest() is then incremental.content_hash of
+    that prefix without reading the file again. When resuming with a
+    digest, the skipped prefix is hashed on the way to offset; if it
+    doesn't match prefix_hash, PrefixChanged is raised before anything is
+    yielded.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        header = f.readline()
+        if digest is not None:
+            digest.update(header)
+        if offset is not None and offset > len(header):
+            if digest is None:
+                f.seek(offset)
+            else:
+                _skip_hashing(f, offset - len(header), digest, block_bytes)
+                if prefix_hash is not None and digest.hexdigest() != prefix_hash:
+                    raise PrefixChanged(f"{path} was rewritten, not appended to")
+        carry = b''
+        while nrows is None or first_row < nrows:
+            chunk = f.read(block_bytes)
+            data = carry + chunk
+            if not chunk:
+                # Last record may lack a trailing newline
+                if data.strip():
+                    if digest is not None:
+                        digest.update(data)
+                    yield header, first_row, data, _complete_records(data + b'\n')[1]
+                return
+            end, count = _complete_records(data)
+            carry = data[end:]
+            if count:
+                if digest is not None:
+                    digest.update(data[:end])
+                yield header, first_row, data[:end], count
+                first_row += count
+
+
+def _skip_hashing(f, length, digest, block_bytes):
+    """Read past the next length bytes of f, adding them to digest"""
+    try:
+        while length > 0:
+            piece = f.read(min(block_bytes, length))
+            if not piece:
+                break
+            digest.update(piece)
+            length -= len(piece)
+    except (OSError, EOFError) as e:
+        # Corrupt or truncated archive
+        raise PrefixChanged(f"{f.name} can't be read up to the checkpoint: {e}") from e
+
+
+def _block_rng(seed, first_row):
+    """Per-block generator, so random fallbacks don't depend on scheduling"""
+    return np.random.default_rng(None if seed is None else [seed, first_row])
+
+
+def process_block(kind, header, first_row, data, nrows=None, seed=None):
+    """Parse, map and clean one block; returns (cleaned, rows_read)
+
+    Runs in a worker process. nrows caps the total records read from the
+    file, so a block may be cut short.
+    """
+    limit = None if nrows is None else max(nrows - first_row, 0)
+    columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    if kind == 'accepted':
+        usecols = accepted_usecols(columns)
+        dtypes = {col: ACCEPTED_DTYPES[col] for col in usecols}
+    else:
+        usecols = [col for col in REJECTED_DTYPES if col in columns]
+        dtypes = {col: REJECTED_DTYPES[col] for col in usecols}
+
+    chunk = pd.read_csv(io.BytesIO(header + data), usecols=usecols, dtype=dtypes, nrows=limit)
+    if kind == 'accepted':
+        chunk = map_accepted(chunk)
+    else:
+        chunk = map_rejected(chunk, first_row, _block_rng(seed, first_row))
+    return clean(chunk), len(chunk)
+
+
+def _tasks(files, block_bytes, nrows, seed, starts, stats):
+    for kind, path in files:
+        if kind == 'rejected' and 'Amount Requested' not in read_header(path):
+            continue
+        offset, first_row, prefix_hash = starts.get(kind, (None, 0, None))
+        digest = hashlib.sha256()
+        position = stats.setdefault(kind, {})
+        position['offset'], position['rows'] = offset or 0, first_row
+        position['hash'] = prefix_hash or digest.hexdigest()
+        for header, first_row, data, rows in iter_blocks(path, block_bytes, nrows, offset, first_row,
+                                                         digest, prefix_hash):
+            # Where this file's read ends, and a hash of everything before
+            # that, for ingestion checkpoints
+            position['offset'] = max(position['offset'], len(header)) + len(data)
+            position['rows'] = first_row + rows
+            position['hash'] = digest.hexdigest()
+            yield kind, (kind, header, first_row, data, nrows, seed)
+
+
+def iter_parallel(accepted_path=ACCEPTED_FILE, rejected_path=REJECTED_FILE, workers=None,
+                  block_bytes=BLOCK_BYTES, nrows=None, stats=None, seed=None, starts=None):
+    """Yield (kind, cleaned) blocks of both files, processed by a process pool
+
+    kind is 'accepted' or 'rejected'; either path may be None to skip that
+    file. Blocks come back in file order. At most two blocks per worker are
+    in flight, so memory stays bounded. stats, if given, gets
+    rows_read/rows_kept per file under 'accepted' and 'rejected', plus the
+    decompressed offset and row count where the read ended and the sha256
+    of the content before it. starts maps a kind to an (offset, first_row,
+    prefix_hash) to resume from (see incremental.py); a skipped prefix that
+    doesn't match its hash raises PrefixChanged. The
+    rejected file's random income fallback is seeded per block, so it
+    differs from read_rejected's but not between runs with the same seed.
+    """
+    workers = workers or os.cpu_count() or 1
+    files = [(kind, path) for kind, path in (('accepted', accepted_path), ('rejected', rejected_path))
+             if path is not None]
+    stats = stats if stats is not None else {}
+
+    def collect(kind, result):
+        cleaned, rows_read = result
+        file_stats = stats.setdefault(kind, {})
+        file_stats['rows_read'] = file_stats.get('rows_read', 0) + rows_read
+        file_stats['rows_kept'] = file_stats.get('rows_kept', 0) + len(cleaned)
+        return kind, cleaned
+
+    tasks = _tasks(files, block_bytes, nrows, seed, starts or {}, stats)
+    if workers == 1:
+        for kind, args in tasks:
+            yield collect(kind, process_block(*args))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for kind, args in tasks:
+            pending.append((kind, pool.submit(process_block, *args)))
+            if len(pending) >= 2 * workers:
+                kind, future = pending.popleft()
+                yield collect(kind, future.result())
+        while pending:
+            kind, future = pending.popleft()
+            yield collect(kind, future.result())
+
+
+def read_parallel(accepted_path=ACCEPTED_FILE, rejected_path=REJECTED_FILE, workers=None,
+                  block_bytes=BLOCK_BYTES, nrows=None, stats=None, seed=None):
+    """Collect iter_parallel into (accepted, rejected) frames"""
+    results = {'accepted': [], 'rejected': []}
+    for kind, cleaned in iter_parallel(accepted_path, rejected_path, workers,
+                                       block_bytes, nrows, stats, seed):
+        results[kind].append(cleaned)
+    return concat_chunks(results['accepted']), concat_chunks(results['rejected'])
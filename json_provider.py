@@ -0,0 +1,105 @@
+# JSON Serialization for Credit Risk API
+# Flask JSON provider whose response encoding is backed by orjson when it
+# is installed, falling back to the standard library otherwise. Both write
+# numpy scalars and arrays as plain numbers and NaN as null.
+
+import json
+import math
+import os
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON_BACKEND=json forces the standard library even when orjson is available
+BACKEND = 'orjson' if orjson is not None and os.environ.get('JSON_BACKEND', 'orjson') == 'orjson' else 'json'
+
+
+def _default(obj):
+    """Convert what json can't write: numpy values first, then Flask's usual types"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return DefaultJSONProvider.default(obj)
+
+
+def _finite(obj):
+    """Copy of obj with NaN and infinities replaced by None"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return _finite(_default(obj))
+    return obj
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with a faster, numpy-aware encoder
+
+    Output matches jsonify's: keys sorted, compact separators (indented in
+    debug mode) and a trailing newline. The one difference is that orjson
+    writes non-ASCII text as UTF-8 rather than \\u escapes.
+    """
+
+    backend = BACKEND
+
+    def _indent(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    # Request bodies are still parsed by DefaultJSONProvider.loads (json.loads):
+    # orjson rejects integers beyond 64 bits and NaN literals, which would
+    # change how requests are validated
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return self._stdlib(obj, **kwargs)
+        if self.backend == 'orjson':
+            try:
+                return self._orjson(obj, indent=False).decode()
+            except TypeError:
+                # orjson.JSONEncodeError is a TypeError; e.g. ints beyond 64 bits
+                pass
+        # Compact like orjson, so /export lines don't depend on the backend
+        return self._stdlib(obj, separators=(",", ":"))
+
+    def encode(self, obj):
+        """Response body bytes for obj, as response() would send them"""
+        if self.backend == 'orjson':
+            try:
+                return self._orjson(obj, indent=self._indent()) + b"\n"
+            except TypeError:
+                pass
+        if self._indent():
+            return (self._stdlib(obj, indent=2) + "\n").encode()
+        return (self._stdlib(obj, separators=(",", ":")) + "\n").encode()
+
+    def response(self, *args, **kwargs):
+        body = self.encode(self._prepare_response_obj(args, kwargs))
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _orjson(self, obj, indent):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        # orjson writes NaN and infinities as null by itself
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def _stdlib(self, obj, **kwargs):
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        try:
+            return json.dumps(obj, allow_nan=False, **kwargs)
+        except ValueError:
+            # Rare: only payloads holding NaN pay for the extra walk
+            return json.dumps(_finite(obj), allow_nan=False, **kwargs)
@@ -2,14 +2,18 @@
 # This script downloads and prepares Kaggle credit datasets
 
 import os
-import pandas as pd
 from pathlib import Path
 
+import ingestion
+import sampling
+import snapshot
+
 class KaggleDataLoader:
     """Load and prepare credit datasets from Kaggle"""
     
-    def __init__(self, kaggle_dir='./kaggle_data'):
+    def __init__(self, kaggle_dir='./kaggle_data', chunksize=ingestion.CHUNK_SIZE):
         self.kaggle_dir = kaggle_dir
+        self.chunksize = chunksize
         Path(kaggle_dir).mkdir(exist_ok=True)
     
     def download_lending_club(self):
@@ -39,6 +43,7 @@ class KaggleDataLoader:
         # Try different possible filenames
         possible_files = [
             './kaggle_data/accepted_2007_to_2018Q4.csv',
+            ingestion.ACCEPTED_FILE,
             './kaggle_data/lending_club.csv',
             './kaggle_data/loan.csv'
         ]
@@ -46,7 +51,9 @@ class KaggleDataLoader:
         for filepath in possible_files:
             if os.path.exists(filepath):
                 print(f"Loading {filepath}...")
-                df = pd.read_csv(filepath, low_memory=False)
+                # Stream in chunks, reading only the mapped columns; the
+                # rows are filtered by prepare_data, not ingestion.clean
+                df = ingestion.concat_chunks(ingestion.iter_accepted(filepath, self.chunksize))
                 return self.prepare_data(df)
         
         raise FileNotFoundError("No Lending Club dataset found")
@@ -95,27 +102,22 @@ class KaggleDataLoader:
         print(f"Prepared dataset: {len(df_filtered)} rows")
         return df_filtered
     
-    def sample_diverse_data(self, df, n=200):
-        """Sample diverse risk profiles for demo"""
-        # Create risk score column
-        df['risk_score'] = 100 - (df['fico_range_high'] / 8.5)
-        df.loc[df['annual_inc'] > 80000, 'risk_score'] -= 15
-        df['risk_score'] = df['risk_score'].clip(0, 100)
-        
-        # Sample from different risk tiers
-        low_risk = df[df['risk_score'] < 30].sample(min(140, len(df[df['risk_score'] < 30])))
-        medium_risk = df[(df['risk_score'] >= 30) & (df['risk_score'] < 60)].sample(min(40, len(df[(df['risk_score'] >= 30) & (df['risk_score'] < 60)])))
-        high_risk = df[df['risk_score'] >= 60].sample(min(20, len(df[df['risk_score'] >= 60])))
-        
-        sampled = pd.concat([low_risk, medium_risk, high_risk])
-        sampled = sampled.drop('risk_score', axis=1)
-        
-        return sampled.reset_index(drop=True)
+    def sample_diverse_data(self, df, n=200, seed=None):
+        """Sample diverse risk profiles for demo (140/40/20 low/medium/high per 200)"""
+        # One pass over df, tiers by the same formula as the API
+        reservoir = sampling.StratifiedReservoir(sampling.scale_quotas(n), seed)
+        reservoir.add(df)
+        return reservoir.sample()
     
     def save_to_csv(self, df, filename='borrowers.csv'):
         """Save prepared data to CSV"""
         df.to_csv(filename, index=False)
         print(f"Saved {len(df)} records to {filename}")
+    
+    def save_snapshot(self, df, path=snapshot.SNAPSHOT_DIR):
+        """Save prepared data as a columnar snapshot for fast API startup"""
+        snapshot.write_snapshot(df, path)
+        print(f"Saved {len(df)} records to snapshot {path}/")
 
 # Example usage
 if __name__ == "__main__":
@@ -145,5 +147,6 @@ if __name__ == "__main__":
     
     # Save to borrowers.csv
     loader.save_to_csv(df_sampled, 'borrowers.csv')
+    loader.save_snapshot(df_sampled)
     
-    print("\n✅ Dataset ready! Restart your Flask server to use it.")
+    print("\n✅ Dataset ready! Reload the API (POST /admin/reload) to use it.")
@@ -0,0 +1,133 @@
+# Logging Setup for Credit Risk API
+# Request threads only put log records on a queue; a background thread
+# formats them (plain text or one JSON object per line) and writes them out.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'text' keeps the classic "time - LEVEL - message" lines; 'json' for log shippers
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# Write logs from a background thread instead of the request thread
+LOG_ASYNC = os.environ.get('LOG_ASYNC', '1') == '1'
+# Fraction of success-path request lines to keep; warnings and errors are always kept
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# `extra=` fields copied into JSON lines when present
+STRUCTURED_FIELDS = ('route', 'method', 'status', 'member_id', 'count', 'latency_ms', 'outcome')
+
+_listener = None
+_queue_handler = None
+_output_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the structured fields passed via extra="""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SuccessSampler(logging.Filter):
+    """Keep a random fraction of INFO-and-below request lines
+
+    Only records carrying a route (i.e. logged while handling a request) are
+    sampled, so startup and reload messages are never dropped.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, 'route', None) is None:
+            return True
+        return random.random() < self.rate
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Enqueue records untouched; the listener thread does the formatting
+
+    The stock QueueHandler formats in the caller so records can be pickled
+    across processes. Our queue never leaves the process, so that work is
+    deferred. Log arguments must therefore not be mutated after the call.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, use_queue=LOG_ASYNC, sample_rate=LOG_SAMPLE_RATE):
+    """Configure the root logger; a no-op if it already has handlers, like basicConfig"""
+    global _listener, _queue_handler, _output_handler
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    root.setLevel(level)
+
+    _output_handler = logging.StreamHandler(sys.stderr)
+    _output_handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    sampler = SuccessSampler(sample_rate)
+
+    if not use_queue:
+        _output_handler.addFilter(sampler)
+        root.addHandler(_output_handler)
+        return
+
+    # Sample before enqueueing so dropped lines cost the request nothing more
+    _queue_handler = _LazyQueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(sampler)
+    root.addHandler(_queue_handler)
+    _start_listener()
+    atexit.register(stop_logging)
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_queue_handler.queue, _output_handler)
+    _listener.start()
+
+
+def after_fork():
+    """Restart the writer thread in a forked worker (threads don't survive fork)"""
+    if _queue_handler is None:
+        return
+    # The parent's queue may have been forked mid-operation; start clean
+    _queue_handler.queue = queue.SimpleQueue()
+    _start_listener()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_stream(stream):
+    """Redirect log output, e.g. to /dev/null for benchmarks"""
+    if _output_handler is not None:
+        _output_handler.setStream(stream)
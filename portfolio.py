@@ -0,0 +1,295 @@
+# Portfolio Analytics for Credit Risk API
+# Score distribution, tier counts, ECL totals and the riskiest borrowers,
+# accumulated chunk by chunk in one vectorized pass
+#   python portfolio.py [borrowers.csv] [--top 10] [--chunksize 500000] [--json]
+
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+import scoring
+
+CHUNK_SIZE = 500000
+TOP_N = 10
+INPUT_COLUMNS = ['member_id', 'fico_range_high', 'annual_inc', 'loan_amnt']
+
+# Risk score histogram: ten buckets of width 10, the last one closed at 100
+SCORE_BINS = np.arange(0, 101, 10)
+
+# FICO quantiles come from a 1-point histogram over this range
+FICO_RANGE = (300, 851)
+
+
+def _top(scores, ids, n, largest):
+    """Indexes of the n highest (or lowest) scores, ties going to the smaller id
+
+    np.partition finds the cut-off score in linear time; only rows at or
+    beyond it are sorted.
+    """
+    if n <= 0 or not len(scores):
+        return np.array([], dtype=np.int64)
+    if len(scores) <= n:
+        return np.arange(len(scores))
+    keys = -scores if largest else scores
+    cutoff = np.partition(keys, n - 1)[n - 1]
+    candidates = np.flatnonzero(keys <= cutoff)
+    if len(candidates) > n:
+        candidates = candidates[np.lexsort((ids[candidates], keys[candidates]))[:n]]
+    return candidates
+
+
+class _Stat:
+    """Running min / max / sum over chunks"""
+    __slots__ = ('min', 'max', 'sum')
+
+    def __init__(self):
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+
+    def add(self, values):
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self.sum += float(values.sum())
+
+    def result(self, count):
+        if not count:
+            return {"min": None, "max": None, "mean": None}
+        return {"min": self.min, "max": self.max, "mean": round(self.sum / count, 4)}
+
+
+class PortfolioSummary:
+    """Portfolio statistics, fed chunk by chunk
+
+    Memory is fixed: running sums, a score histogram, per-tier counters and
+    at most 2 * top_n candidate rows, whatever the number of borrowers.
+    """
+
+    def __init__(self, top_n=TOP_N):
+        self.top_n = top_n
+        self.count = 0
+        self.skipped = 0
+        self.fico = _Stat()
+        self.income = _Stat()
+        self.loan = _Stat()
+        self.score = _Stat()
+        self.score_counts = np.zeros(len(SCORE_BINS) - 1, dtype=np.int64)
+        self.fico_counts = np.zeros(FICO_RANGE[1] - FICO_RANGE[0], dtype=np.int64)
+        self.tier_counts = np.zeros(len(scoring.RISK_CATEGORIES), dtype=np.int64)
+        self.tier_ecl = np.zeros(len(scoring.RISK_CATEGORIES))
+        self.tier_loans = np.zeros(len(scoring.RISK_CATEGORIES))
+        self._riskiest = None
+        self._safest = None
+
+    def add(self, member_id, fico, income, loan):
+        """Score raw columns with the API formula and add them"""
+        fico = np.asarray(fico, dtype=float)
+        income = np.asarray(income, dtype=float)
+        loan = np.asarray(loan, dtype=float)
+        valid = ~(np.isnan(fico) | np.isnan(income) | np.isnan(loan))
+        self.skipped += int(len(valid) - valid.sum())
+        if not valid.all():
+            member_id, fico, income, loan = (np.asarray(a)[valid] for a in (member_id, fico, income, loan))
+
+        raw = scoring.risk_scores(fico, income)
+        scores = scoring.round2(raw)
+        ecl = scoring.round2(scoring.expected_credit_losses(loan, scores))
+        self.add_scored(member_id, fico, income, loan, scores, scoring.risk_category_codes(raw), ecl)
+
+    def add_frame(self, df):
+        self.add(df['member_id'].to_numpy(), df['fico_range_high'].to_numpy(dtype=float),
+                 df['annual_inc'].to_numpy(dtype=float), df['loan_amnt'].to_numpy(dtype=float))
+
+    def add_scored(self, member_id, fico, income, loan, scores, tier_codes, ecl):
+        """Add rows whose scores are already known (e.g. a borrower store's)"""
+        n = len(scores)
+        if not n:
+            return
+        self.count += n
+        self.fico.add(fico)
+        self.income.add(income)
+        self.loan.add(loan)
+        self.score.add(scores)
+
+        # Scores are clipped to [0, 100]; 100 lands in the last bucket
+        buckets = np.minimum((scores // 10).astype(np.int64), len(self.score_counts) - 1)
+        self.score_counts += np.bincount(buckets, minlength=len(self.score_counts))
+        fico_bins = np.clip(fico.astype(np.int64), FICO_RANGE[0], FICO_RANGE[1] - 1) - FICO_RANGE[0]
+        self.fico_counts += np.bincount(fico_bins, minlength=len(self.fico_counts))
+
+        tiers = len(scoring.RISK_CATEGORIES)
+        self.tier_counts += np.bincount(tier_codes, minlength=tiers)
+        self.tier_ecl += np.bincount(tier_codes, weights=ecl, minlength=tiers)
+        self.tier_loans += np.bincount(tier_codes, weights=loan, minlength=tiers)
+
+        rows = {
+            'member_id': np.asarray(member_id), 'fico_range_high': fico, 'annual_inc': income,
+            'loan_amnt': loan, 'risk_score': scores, 'tier': tier_codes, 'expected_credit_loss': ecl
+        }
+        self._riskiest = self._keep(self._riskiest, rows, largest=True)
+        self._safest = self._keep(self._safest, rows, largest=False)
+
+    def _keep(self, current, rows, largest):
+        """Merge this chunk's top candidates into the running top_n"""
+        picked = _top(rows['risk_score'], rows['member_id'], self.top_n, largest)
+        candidates = {col: values[picked] for col, values in rows.items()}
+        if current is not None:
+            candidates = {col: np.concatenate([current[col], candidates[col]]) for col in candidates}
+        picked = _top(candidates['risk_score'], candidates['member_id'], self.top_n, largest)
+        return {col: values[picked] for col, values in candidates.items()}
+
+    def _fico_quantiles(self):
+        if not self.count:
+            return {}
+        cumulative = np.cumsum(self.fico_counts)
+        return {
+            label: int(FICO_RANGE[0] + np.searchsorted(cumulative, q * self.count))
+            for label, q in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75))
+        }
+
+    @staticmethod
+    def _borrowers(rows, largest):
+        if rows is None:
+            return []
+        # Riskiest first (or safest first); member_id breaks ties
+        order = np.lexsort((rows['member_id'], -rows['risk_score'] if largest else rows['risk_score']))
+        return [
+            {
+                "member_id": int(rows['member_id'][i]),
+                "fico_range_high": float(rows['fico_range_high'][i]),
+                "annual_inc": float(rows['annual_inc'][i]),
+                "loan_amnt": float(rows['loan_amnt'][i]),
+                "risk_score": float(rows['risk_score'][i]),
+                "risk_category": scoring.RISK_CATEGORIES[rows['tier'][i]],
+                "expected_credit_loss": float(rows['expected_credit_loss'][i])
+            }
+            for i in order
+        ]
+
+    def result(self):
+        """JSON-ready summary"""
+        total_ecl = float(self.tier_ecl.sum())
+        tiers = {
+            name: {
+                "count": int(self.tier_counts[i]),
+                "share": round(self.tier_counts[i] / self.count, 4) if self.count else 0.0,
+                "loan_amnt": round(float(self.tier_loans[i]), 2),
+                "expected_credit_loss": round(float(self.tier_ecl[i]), 2)
+            }
+            for i, name in enumerate(scoring.RISK_CATEGORIES)
+        }
+        loans = self.loan.result(self.count)
+        loans["total"] = round(self.loan.sum, 2)
+        return {
+            "borrowers": self.count,
+            "skipped": self.skipped,
+            "fico_range_high": dict(self.fico.result(self.count), quantiles=self._fico_quantiles()),
+            "annual_inc": self.income.result(self.count),
+            "loan_amnt": loans,
+            "risk_score": dict(self.score.result(self.count), histogram={
+                "bins": SCORE_BINS.tolist(),
+                "counts": self.score_counts.tolist()
+            }),
+            "tiers": tiers,
+            "expected_credit_loss": {
+                "total": round(total_ecl, 2),
+                "loss_rate": round(total_ecl / self.loan.sum, 4) if self.loan.sum else 0.0
+            },
+            "riskiest": self._borrowers(self._riskiest, largest=True),
+            "safest": self._borrowers(self._safest, largest=False)
+        }
+
+
+def summarize_file(path, top_n=TOP_N, chunksize=CHUNK_SIZE):
+    """Summary of a borrowers CSV, read chunksize rows at a time"""
+    summary = PortfolioSummary(top_n)
+    with pd.read_csv(path, usecols=INPUT_COLUMNS, chunksize=chunksize) as reader:
+        for chunk in reader:
+            summary.add_frame(chunk)
+    return summary
+
+
+def summarize_rows(store, top_n=TOP_N, chunksize=CHUNK_SIZE):
+    """Summary of a store without column arrays (e.g. SqliteStore), block by block"""
+    summary = PortfolioSummary(top_n)
+    for columns, rows in store.iter_rows(block_rows=chunksize):
+        summary.add_frame(pd.DataFrame.from_records(list(rows), columns=columns).astype({
+            col: float for col in INPUT_COLUMNS if col != 'member_id'
+        }))
+    return summary
+
+
+def summarize_store(store, top_n=TOP_N):
+    """Summary of a BorrowerStore, reusing its precomputed score columns"""
+    if not store.columnar:
+        return summarize_rows(store, top_n)
+    summary = PortfolioSummary(top_n)
+    if not store.score_columns:
+        summary.add(*(store.array(col) for col in INPUT_COLUMNS))
+        return summary
+    # Category order differs between stores (snapshots sort them); map the
+    # codes onto RISK_CATEGORIES, keeping -1 for missing
+    categories = store.array('risk_category')
+    to_tier = np.array([scoring.RISK_CATEGORIES.index(c) for c in categories.categories] + [-1])
+    codes = to_tier[np.asarray(categories.codes, dtype=np.int64)]
+    columns = [np.asarray(store.array(col), dtype=float) for col in ('fico_range_high', 'annual_inc', 'loan_amnt')]
+    # Skip the same rows as PortfolioSummary.add: any missing input, not
+    # only a missing score
+    valid = (codes >= 0) & ~np.isnan(columns[0]) & ~np.isnan(columns[1]) & ~np.isnan(columns[2])
+    scored = [np.asarray(store.array(col), dtype=float) for col in ('risk_score', 'expected_credit_loss')]
+    member_id = np.asarray(store.array('member_id'))
+    if not valid.all():
+        summary.skipped = int(len(valid) - valid.sum())
+        member_id, codes = member_id[valid], codes[valid]
+        columns = [values[valid] for values in columns]
+        scored = [values[valid] for values in scored]
+    fico, income, loan = columns
+    scores, ecl = scored
+    summary.add_scored(member_id, fico, income, loan, scores, codes, ecl)
+    return summary
+
+
+def _print_report(result):
+    print("=" * 50)
+    print("PORTFOLIO SUMMARY")
+    print("=" * 50)
+    print(f"\nBorrowers: {result['borrowers']:,} ({result['skipped']:,} skipped for missing values)")
+    fico, score = result['fico_range_high'], result['risk_score']
+    print(f"FICO: {fico['min']:.0f} - {fico['max']:.0f}, mean {fico['mean']:.2f}, median {fico['quantiles'].get('50%')}")
+    print(f"Risk score: {score['min']:.2f} - {score['max']:.2f}, mean {score['mean']:.2f}")
+
+    print("\nRisk score distribution:")
+    bins, counts = score['histogram']['bins'], score['histogram']['counts']
+    for low, high, count in zip(bins, bins[1:], counts):
+        print(f"  {low:>3}-{high:<3} {count:>10,}")
+
+    print("\nTiers:")
+    for name, tier in result['tiers'].items():
+        print(f"  {name:<7} {tier['count']:>10,} ({tier['share'] * 100:5.1f}%)  ECL ${tier['expected_credit_loss']:,.2f}")
+    ecl = result['expected_credit_loss']
+    print(f"\nTotal ECL: ${ecl['total']:,.2f} ({ecl['loss_rate'] * 100:.2f}% of ${result['loan_amnt']['total']:,.2f} lent)")
+
+    for title, key in (("Riskiest", 'riskiest'), ("Safest", 'safest')):
+        print(f"\n{title} {len(result[key])} borrowers:")
+        if result[key]:
+            print(pd.DataFrame(result[key]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a borrower portfolio")
+    parser.add_argument('csv', nargs='?', default='borrowers.csv')
+    parser.add_argument('--top', type=int, default=TOP_N, help="riskiest/safest borrowers to list")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="rows read at a time")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize_file(args.csv, args.top, args.chunksize).result()
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(summary)
@@ -0,0 +1,251 @@
+# Secondary Indexes for Credit Risk API
+# Sorted indexes over the numeric borrower columns, so range filters and
+# top-N queries touch only matching rows instead of scanning the table
+
+import base64
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+# Columns that can be filtered and ordered on
+INDEXED_COLUMNS = ['fico_range_high', 'annual_inc', 'loan_amnt', 'risk_score', 'expected_credit_loss']
+
+# Filter operators: {"fico_range_high": {"gte": 580, "lte": 620}}
+OPERATORS = ('gt', 'gte', 'lt', 'lte', 'eq')
+
+# Rows checked per step when walking the ordering index past other filters
+WALK_BATCH = 4096
+
+
+class QueryError(ValueError):
+    """Invalid query or cursor; the message is safe to show to clients"""
+
+
+class SortedColumnIndex:
+    """Row positions of one column in ascending value order
+
+    Ties keep row order (stable sort). NaN sorts last and matches no range.
+    order and sorted_values can be passed in prebuilt (e.g. memory-mapped
+    from a snapshot) instead of sorting values.
+    """
+
+    def __init__(self, values=None, order=None, sorted_values=None):
+        if order is None:
+            values = np.asarray(values, dtype=float)
+            dtype = np.int32 if len(values) < 2**31 else np.int64
+            order = np.argsort(values, kind='stable').astype(dtype)
+            sorted_values = values[order]
+        self.order = order
+        self.values = sorted_values
+        # NaNs sit at the end; ranges never reach them
+        self.size = int(np.searchsorted(sorted_values, np.nan))
+
+    def span(self, bounds):
+        """[start, stop) of the sorted positions inside bounds (O(log n))"""
+        start, stop = 0, self.size
+        searchable = self.values[:self.size]
+        for op, value in bounds.items():
+            if op in ('gt', 'gte'):
+                side = 'right' if op == 'gt' else 'left'
+                start = max(start, int(np.searchsorted(searchable, value, side=side)))
+            if op in ('lt', 'lte'):
+                side = 'left' if op == 'lt' else 'right'
+                stop = min(stop, int(np.searchsorted(searchable, value, side=side)))
+            if op == 'eq':
+                start = max(start, int(np.searchsorted(searchable, value, side='left')))
+                stop = min(stop, int(np.searchsorted(searchable, value, side='right')))
+        return start, max(start, stop)
+
+
+def _matches(column, bounds):
+    """Vectorized check of bounds against column values"""
+    keep = ~np.isnan(column)
+    for op, value in bounds.items():
+        if op == 'gt':
+            keep &= column > value
+        elif op == 'gte':
+            keep &= column >= value
+        elif op == 'lt':
+            keep &= column < value
+        elif op == 'lte':
+            keep &= column <= value
+        else:
+            keep &= column == value
+    return keep
+
+
+def parse_filters(filters):
+    """Validate {"column": {"op": number}}; returns {column: {op: float}}"""
+    if filters is None:
+        return {}
+    if not isinstance(filters, dict):
+        raise QueryError("filters must be an object")
+    parsed = {}
+    for column, bounds in filters.items():
+        if column not in INDEXED_COLUMNS:
+            raise QueryError(f"Cannot filter on {column}; use one of {', '.join(INDEXED_COLUMNS)}")
+        if not isinstance(bounds, dict) or not bounds:
+            raise QueryError(f"Filter on {column} must be an object like {{\"gte\": 0}}")
+        parsed[column] = {}
+        for op, value in bounds.items():
+            if op not in OPERATORS:
+                raise QueryError(f"Unknown operator {op}; use one of {', '.join(OPERATORS)}")
+            if isinstance(value, bool):
+                raise QueryError(f"{column} {op} must be a number")
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                raise QueryError(f"{column} {op} must be a number")
+            if np.isnan(value):
+                raise QueryError(f"{column} {op} must be a number")
+            parsed[column][op] = value
+    return parsed
+
+
+class QueryIndex:
+    """Sorted indexes over INDEXED_COLUMNS of one BorrowerStore
+
+    A query with range filters starts from whichever index gives the
+    fewest candidate rows (found by binary search) and checks the other
+    filters on those rows only. When the ordering column's own index is
+    cheap enough, the query walks it in order and stops once the page is
+    full, so top-N queries read about N rows. Results are ordered by
+    (order_by value, row position); 'desc' is the exact reverse.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # The store's own arrays, not float copies: in a forked worker they
+        # stay shared with the master (or the snapshot's page cache)
+        self._columns = {col: store.array(col) for col in INDEXED_COLUMNS}
+        self._indexes = {
+            col: SortedColumnIndex(order=order, sorted_values=values)
+            for col, (order, values) in getattr(store, 'sort_indexes', {}).items()
+        }
+        self._lock = threading.Lock()
+
+    def index(self, column):
+        """The SortedColumnIndex for column, built on first use"""
+        index = self._indexes.get(column)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(column)
+                if index is None:
+                    index = self._indexes[column] = SortedColumnIndex(self._columns[column])
+        return index
+
+    def build(self):
+        """Build every index now, e.g. before gunicorn forks the workers"""
+        for column in INDEXED_COLUMNS:
+            self.index(column)
+        return self
+
+    def _values(self, column, positions):
+        return np.asarray(self._columns[column][positions], dtype=float)
+
+    def _filter(self, positions, filters, skip=None):
+        keep = np.ones(len(positions), dtype=bool)
+        for column, bounds in filters.items():
+            if column != skip:
+                keep &= _matches(self._values(column, positions), bounds)
+        return positions[keep]
+
+    def search(self, filters, order_by, descending, limit, after=0):
+        """(positions, next_after) for one page of results
+
+        after is the opaque resume point from the previous page (0 for the
+        first page); next_after is None on the last page.
+        """
+        order_index = self.index(order_by)
+        order_span = order_index.span(filters.get(order_by, {}))
+        order_count = order_span[1] - order_span[0]
+
+        spans = {column: self.index(column).span(bounds) for column, bounds in filters.items()}
+        smallest = min(spans, key=lambda column: spans[column][1] - spans[column][0], default=order_by)
+        smallest_count = min(order_count, spans[smallest][1] - spans[smallest][0]) if spans else order_count
+
+        # Walking the ordering index reads ~limit * order_count / matches rows
+        expected_walk = limit * order_count / max(smallest_count, 1)
+        if smallest == order_by or expected_walk <= smallest_count:
+            return self._walk(order_index, order_span, filters, order_by, descending, limit, after)
+        return self._collect(spans[smallest], smallest, filters, order_by, descending, limit, after)
+
+    def _walk(self, index, span, filters, order_by, descending, limit, after):
+        """Scan the ordering index in result order; after counts index entries consumed"""
+        start, stop = span
+        found = []
+        needed = limit + 1
+        consumed = after
+        while needed > 0 and consumed < stop - start:
+            take = min(max(WALK_BATCH, limit * 2), stop - start - consumed)
+            if descending:
+                batch = index.order[stop - consumed - take:stop - consumed][::-1]
+            else:
+                batch = index.order[start + consumed:start + consumed + take]
+            matched = self._filter(batch, filters, skip=order_by)
+            if len(matched) >= needed:
+                # Resume right after the last row returned on this page
+                last = matched[needed - 2] if needed > 1 else None
+                found.append(matched[:needed])
+                if last is not None:
+                    consumed += int(np.flatnonzero(batch == last)[0]) + 1
+                needed = 0
+                break
+            found.append(matched)
+            needed -= len(matched)
+            consumed += take
+        positions = np.concatenate(found) if found else np.array([], dtype=np.int64)
+        if len(positions) > limit:
+            return positions[:limit], consumed
+        return positions, None
+
+    def _collect(self, span, column, filters, order_by, descending, limit, after):
+        """Take every candidate from the most selective index, filter and sort; after is an offset"""
+        start, stop = span
+        candidates = self._filter(self.index(column).order[start:stop], filters)
+        keys = self._values(order_by, candidates)
+        # Rows without an order_by value are left out, as when walking its index
+        candidates, keys = candidates[~np.isnan(keys)], keys[~np.isnan(keys)]
+        ordered = candidates[np.lexsort((candidates, keys))]
+        if descending:
+            ordered = ordered[::-1]
+        page = ordered[after:after + limit]
+        return page, (after + limit if after + limit < len(ordered) else None)
+
+
+def sort_indexes(arrays):
+    """{column: (order, sorted float values)} for the INDEXED_COLUMNS in arrays"""
+    built = {}
+    for column in INDEXED_COLUMNS:
+        if column in arrays:
+            index = SortedColumnIndex(arrays[column])
+            built[column] = (index.order, index.values)
+    return built
+
+
+def encode_cursor(version, query_key, after):
+    payload = json.dumps({'v': version, 'q': query_key, 'a': int(after)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, version, query_key):
+    """Resume point stored in cursor; QueryError if it is malformed or stale"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        after = int(payload['a'])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise QueryError("cursor is invalid")
+    if payload.get('q') != query_key or after < 0:
+        raise QueryError("cursor belongs to a different query")
+    if payload.get('v') != version:
+        raise QueryError("cursor has expired: the borrower data was reloaded")
+    return after
+
+
+def query_key(filters, order_by, descending, limit):
+    """Short fingerprint tying a cursor to the query that produced it"""
+    raw = json.dumps([filters, order_by, descending, limit], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
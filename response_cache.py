@@ -0,0 +1,84 @@
+# Response Cache for Credit Risk API
+# Memoizes serialized responses of the pure scoring endpoints
+
+import threading
+import time
+from collections import OrderedDict
+
+import scoring
+
+
+class ResponseCache:
+    """Bounded LRU of response bodies with a time-to-live
+
+    Entries are dropped when the cache is full (least recently used first),
+    when they are older than ttl seconds, and all at once when the scoring
+    parameters change.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._params = scoring.parameters()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _check_params(self):
+        """Invalidate everything if the scoring formula changed under us"""
+        params = scoring.parameters()
+        if params != self._params:
+            self._entries.clear()
+            self._params = params
+
+    def get(self, key):
+        """Cached body for key, or None"""
+        with self._lock:
+            self._check_params()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        """Store body under key, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for /health"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,142 @@
+# Stratified Reservoir Sampling
+# Draws a fixed number of rows per risk tier from a stream of chunks in a
+# single pass; memory depends on the sample size, not the dataset size
+
+import numpy as np
+import pandas as pd
+
+import scoring
+
+# Demo dataset mix: 140 low, 40 medium and 20 high risk borrowers
+DEFAULT_QUOTAS = {'Low': 140, 'Medium': 40, 'High': 20}
+
+
+def scale_quotas(n, quotas=DEFAULT_QUOTAS):
+    """Quotas with the same proportions as quotas, summing to n (largest remainder)"""
+    total = sum(quotas.values())
+    exact = {tier: n * quota / total for tier, quota in quotas.items()}
+    scaled = {tier: int(value) for tier, value in exact.items()}
+    by_remainder = sorted(quotas, key=lambda tier: exact[tier] - scaled[tier], reverse=True)
+    for tier in by_remainder[:n - sum(scaled.values())]:
+        scaled[tier] += 1
+    return scaled
+
+
+def risk_tiers(df):
+    """Risk category of every row, by the API's scoring formula"""
+    return scoring.risk_categories(scoring.risk_scores(df['fico_range_high'], df['annual_inc']))
+
+
+class StratifiedReservoir:
+    """Uniform sample of up to quotas[tier] rows per tier (reservoir sampling)
+
+    Feed chunks with add(); every row seen so far has the same chance of
+    being in the sample. The same seed and chunk sequence always give the
+    same sample. Tiers with fewer rows than their quota keep all of them.
+    """
+
+    def __init__(self, quotas=DEFAULT_QUOTAS, seed=None):
+        self.quotas = dict(quotas)
+        self.seen = {tier: 0 for tier in self.quotas}
+        self._rng = np.random.default_rng(seed)
+        self._reservoirs = {tier: None for tier in self.quotas}
+
+    def add(self, chunk, tiers=None):
+        """Offer every row of chunk; tiers defaults to risk_tiers(chunk)"""
+        tiers = risk_tiers(chunk) if tiers is None else np.asarray(tiers)
+        for tier, quota in self.quotas.items():
+            rows = chunk[tiers == tier]
+            if len(rows) and quota > 0:
+                self._offer(tier, quota, rows)
+            self.seen[tier] += len(rows)
+
+    def _offer(self, tier, quota, rows):
+        # Algorithm R, vectorized: row t (0-based over the whole stream) takes
+        # slot t while the reservoir fills, then slot r ~ U[0, t] if r < quota
+        t = self.seen[tier] + np.arange(len(rows))
+        slots = np.where(t < quota, t, self._rng.integers(0, t + 1))
+        taken = np.flatnonzero(slots < quota)
+        if not len(taken):
+            return
+
+        # Several rows may hit the same slot; the last one in stream order wins
+        winners = len(taken) - 1 - np.unique(slots[taken][::-1], return_index=True)[1]
+        new_slots = slots[taken][winners]
+        new_rows = rows.iloc[taken[winners]]
+
+        reservoir = self._reservoirs[tier]
+        size = 0 if reservoir is None else len(reservoir)
+        # Slot i lives at row i of the reservoir; new rows are appended, then
+        # the reservoir is re-taken in slot order
+        positions = np.arange(max(size, new_slots.max() + 1))
+        positions[new_slots] = size + np.arange(len(new_slots))
+        combined = new_rows if reservoir is None else pd.concat([reservoir, new_rows])
+        self._reservoirs[tier] = combined.iloc[positions]
+
+    def state(self):
+        """JSON-ready state for resuming the sampler later (see restore)"""
+        return {
+            'quotas': self.quotas,
+            'seen': {tier: int(seen) for tier, seen in self.seen.items()},
+            'counts': self.counts(),
+            'rng': self._rng.bit_generator.state
+        }
+
+    @classmethod
+    def restore(cls, state, sample):
+        """Resume from state() and the sample() taken at the same time
+
+        Feeding further chunks then gives the same result as if the sampler
+        had never stopped.
+        """
+        reservoir = cls(state['quotas'])
+        reservoir.seen = dict(state['seen'])
+        reservoir._rng.bit_generator.state = state['rng']
+        start = 0
+        for tier, count in state['counts'].items():
+            if count:
+                reservoir._reservoirs[tier] = sample.iloc[start:start + count]
+            start += count
+        return reservoir
+
+    def update(self, chunk, key='member_id'):
+        """Overwrite sampled rows whose key reappears in chunk (upsert)
+
+        Returns the rows of chunk that are not updates; only those should be
+        offered with add(). An updated row keeps its slot even if its tier
+        has changed.
+        """
+        is_update = np.zeros(len(chunk), dtype=bool)
+        for tier, reservoir in self._reservoirs.items():
+            if reservoir is None:
+                continue
+            positions = pd.Index(reservoir[key]).get_indexer(chunk[key])
+            found = positions >= 0
+            if not found.any():
+                continue
+            # The last occurrence in chunk wins
+            latest = chunk[found].drop_duplicates(key, keep='last')
+            positions = np.arange(len(reservoir))
+            positions[pd.Index(reservoir[key]).get_indexer(latest[key])] = len(reservoir) + np.arange(len(latest))
+            self._reservoirs[tier] = pd.concat([reservoir, latest[reservoir.columns]]).iloc[positions]
+            is_update |= found
+        return chunk[~is_update]
+
+    def sample(self):
+        """The current sample, tiers in quota order"""
+        parts = [r for r in self._reservoirs.values() if r is not None]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts).reset_index(drop=True)
+
+    def counts(self):
+        """Rows currently sampled per tier"""
+        return {tier: 0 if r is None else len(r) for tier, r in self._reservoirs.items()}
+
+
+def stratified_sample(chunks, quotas=DEFAULT_QUOTAS, seed=None):
+    """One pass over an iterable of chunks; returns the StratifiedReservoir"""
+    reservoir = StratifiedReservoir(quotas, seed)
+    for chunk in chunks:
+        reservoir.add(chunk)
+    return reservoir
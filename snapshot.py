@@ -0,0 +1,148 @@
+# Columnar Borrower Snapshot
+# Saves the borrower table as raw .npy columns plus a sorted member_id index,
+# so the API can memory-map it at startup instead of parsing borrowers.csv
+
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import query_index
+import scoring
+from borrower_store import BorrowerStore, SortedIndex, compact_frame, json_types
+
+SNAPSHOT_DIR = 'borrowers_snapshot'
+SNAPSHOT_FORMAT = 1
+META_FILE = 'meta.json'
+
+
+def _column_file(path, name):
+    return os.path.join(path, f"{name}.npy")
+
+
+def _save_column(path, name, series, meta):
+    """Write one column; strings are stored as categorical codes"""
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        categorical = series.astype('category')
+        np.save(_column_file(path, name), categorical.cat.codes.to_numpy())
+        meta['categories'][name] = [str(c) for c in categorical.cat.categories]
+    else:
+        np.save(_column_file(path, name), series.to_numpy())
+
+
+def _load_column(path, name, meta, mmap_mode):
+    """Read one column; categorical codes come back as a pd.Categorical"""
+    values = np.load(_column_file(path, name), mmap_mode=mmap_mode)
+    if name in meta['categories']:
+        return pd.Categorical.from_codes(values, meta['categories'][name])
+    return values
+
+
+def exists(path=SNAPSHOT_DIR):
+    """True if path holds a complete snapshot"""
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def write_snapshot(df, path=SNAPSHOT_DIR):
+    """Save df (plus precomputed scores and index) as a columnar snapshot
+
+    Columns are stored in the compact dtypes of borrower_store.SCHEMA.
+    The snapshot is built in a temporary directory and moved into place, so
+    readers never see a half-written one.
+    """
+    types = json_types(df)
+    df = compact_frame(df.reset_index(drop=True))
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'rows': len(df),
+        'columns': list(df.columns),
+        'categories': {},
+        'json_types': types,
+        'scoring': scoring.parameters(),
+        'created': time.time()
+    }
+
+    for col in df.columns:
+        _save_column(tmp_path, col, df[col], meta)
+
+    # Scores computed now so workers don't redo it at startup
+    scored = scoring.score_frame(df)
+    for col in scoring.SCORE_COLUMNS:
+        _save_column(tmp_path, col, scored[col], meta)
+
+    index = SortedIndex.from_ids(df['member_id'].to_numpy())
+    np.save(os.path.join(tmp_path, 'index_ids.npy'), index.ids)
+    np.save(os.path.join(tmp_path, 'index_positions.npy'), index.positions)
+
+    # /query's sort orders, memory-mapped by every worker instead of each
+    # sorting its own copy
+    arrays = {col: df[col].to_numpy() for col in df.columns if pd.api.types.is_numeric_dtype(df[col].dtype)}
+    arrays.update((col, scored[col].to_numpy()) for col in ('risk_score', 'expected_credit_loss'))
+    for col, (order, values) in query_index.sort_indexes(arrays).items():
+        np.save(os.path.join(tmp_path, f'order_{col}.npy'), order)
+        np.save(os.path.join(tmp_path, f'sorted_{col}.npy'), values)
+
+    # meta.json last: its presence marks the snapshot complete
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+def load_store(path=SNAPSHOT_DIR, mmap_mode='r', **kwargs):
+    """Open a snapshot as a BorrowerStore, memory-mapping the columns
+
+    With mmap_mode='r' pages come from the OS page cache and are shared by
+    every process that opens the same snapshot. Precomputed scores are
+    ignored (and recomputed) if the scoring parameters have changed since
+    the snapshot was written.
+    """
+    if not exists(path):
+        raise FileNotFoundError(f"No snapshot at {path}")
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    columns = meta['columns']
+    arrays = {col: _load_column(path, col, meta, mmap_mode) for col in columns}
+    if meta.get('scoring') == scoring.parameters():
+        for col in scoring.SCORE_COLUMNS:
+            arrays[col] = _load_column(path, col, meta, mmap_mode)
+
+    index = SortedIndex(
+        np.load(os.path.join(path, 'index_ids.npy'), mmap_mode=mmap_mode),
+        np.load(os.path.join(path, 'index_positions.npy'), mmap_mode=mmap_mode)
+    )
+    # Sort orders over stale scores are skipped along with the scores;
+    # snapshots written before they existed simply have none
+    sort_indexes = {}
+    for col in query_index.INDEXED_COLUMNS:
+        order_file = os.path.join(path, f'order_{col}.npy')
+        if col in arrays and os.path.exists(order_file):
+            sort_indexes[col] = (np.load(order_file, mmap_mode=mmap_mode),
+                                 np.load(os.path.join(path, f'sorted_{col}.npy'), mmap_mode=mmap_mode))
+    kwargs.setdefault('json_types', meta.get('json_types'))
+    kwargs.setdefault('sort_indexes', sort_indexes)
+    return BorrowerStore(arrays, columns, index=index, **kwargs)
+
+
+if __name__ == "__main__":
+    # Convert an existing CSV: python snapshot.py [borrowers.csv] [borrowers_snapshot]
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else 'borrowers.csv'
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else SNAPSHOT_DIR
+    df = pd.read_csv(csv_file)
+    write_snapshot(df, out_dir)
+    print(f"Saved {len(df)} records from {csv_file} to snapshot {out_dir}/")
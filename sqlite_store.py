@@ -0,0 +1,313 @@
+# SQLite Storage Backend for Credit Risk API
+# Keeps the borrower table on disk for datasets larger than RAM; lookups go
+# through the member_id primary key, with a small hot-row cache in front
+#   python sqlite_store.py [borrowers.csv] [borrowers.sqlite]
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from borrower_store import INT64_MAX, INT64_MIN, SCHEMA, CachedStore, compact_frame
+
+DATABASE_FILE = 'borrowers.sqlite'
+DATABASE_FORMAT = 1
+
+# Hot rows kept in memory per process (records and encoded bodies each)
+CACHE_SIZE = 10000
+# Rows read from the CSV and inserted per transaction step by the CLI
+WRITE_CHUNK = 100000
+# Bytes of the database file each connection memory-maps for reads
+MMAP_BYTES = 256 * 1024 * 1024
+# member_ids per batched lookup query; short batches are padded with NULL
+# (which matches nothing) so the statement is prepared once
+LOOKUP_BATCH = 64
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(column, series):
+    """Column type that gives back the JSON type the in-memory store would:
+    the type the first chunk's column was parsed as"""
+    if column == 'member_id':
+        return 'INTEGER PRIMARY KEY'
+    if column in SCHEMA and SCHEMA[column][1] is str:
+        return 'TEXT'
+    if column in SCHEMA and not pd.api.types.is_numeric_dtype(series.dtype):
+        # compact_frame rejects these when the rows are added
+        return {int: 'INTEGER', float: 'REAL'}[SCHEMA[column][1]]
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return 'INTEGER'
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sql_values(values):
+    """Column as a list of Python values, missing ones as None"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iub':
+        return values.tolist()
+    out = values.astype(object)
+    out[pd.isna(values)] = None
+    if values.dtype.kind == 'f':
+        return out.tolist()
+    return [None if val is None else str(val) for val in out.tolist()]
+
+
+def exists(path=DATABASE_FILE):
+    return os.path.exists(path)
+
+
+class DatabaseWriter:
+    """Writes borrower DataFrame chunks into a SQLite database
+
+        with DatabaseWriter('borrowers.sqlite') as writer:
+            for chunk in chunks:
+                writer.add(chunk)
+
+    Scores are computed per chunk and stored with the rows. A new database
+    is built in a temporary file and moved into place on close, so readers
+    never see a half-written one; with append=True rows go into the
+    existing database in one transaction instead. Duplicate member_ids keep
+    the first row, like BorrowerStore, unless replace=True (upsert: the
+    latest row wins).
+    """
+
+    def __init__(self, path=DATABASE_FILE, append=False, replace=False):
+        self.path = path
+        self.append = append and exists(path)
+        self.replace = replace
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.columns = None
+        self._write_path = path if self.append else f"{path}.tmp"
+        if not self.append and os.path.exists(self._write_path):
+            os.remove(self._write_path)
+        self._conn = sqlite3.connect(self._write_path, isolation_level=None)
+        if not self.append:
+            # Nobody reads the temporary file until it is complete
+            self._conn.execute("PRAGMA journal_mode = OFF")
+            self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute("BEGIN")
+        if self.append:
+            meta = _read_meta(self._conn)
+            if meta.get('scoring') != scoring.parameters():
+                self.abort()
+                raise ValueError(f"Scores in {path} were computed with other scoring parameters; rebuild it")
+            self.columns = meta['columns']
+
+    def _create(self, df):
+        if 'member_id' not in df.columns:
+            raise ValueError("member_id column is required")
+        self.columns = list(df.columns)
+        definitions = [f"{_quote(col)} {_sql_type(col, df[col])}" for col in self.columns]
+        if {'fico_range_high', 'annual_inc', 'loan_amnt'} <= set(self.columns):
+            definitions += ['risk_score REAL', 'risk_category TEXT', 'expected_credit_loss REAL']
+        self._conn.execute(f"CREATE TABLE borrowers ({', '.join(definitions)})")
+        self._conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def add(self, df):
+        """Insert the rows of df; rows without a member_id are skipped"""
+        if self.columns is None:
+            self._create(df)
+        elif list(df.columns) != self.columns:
+            raise ValueError(f"Columns {list(df.columns)} don't match the database's {self.columns}")
+
+        missing = df['member_id'].isna()
+        if missing.any():
+            self.rows_skipped += int(missing.sum())
+            df = df[~missing]
+        if not len(df):
+            return
+        # Same type checks as the in-memory store
+        df = compact_frame(df)
+
+        columns = [_sql_values(df[col].to_numpy()) for col in self.columns]
+        names = list(self.columns)
+        if {'fico_range_high', 'annual_inc', 'loan_amnt'} <= set(self.columns):
+            scores, categories, losses = scoring.score_arrays(
+                df['fico_range_high'].to_numpy(dtype=float),
+                df['annual_inc'].to_numpy(dtype=float),
+                df['loan_amnt'].to_numpy(dtype=float)
+            )
+            columns += [_sql_values(scores), list(categories), _sql_values(losses)]
+            names += scoring.SCORE_COLUMNS
+
+        verb = "INSERT OR REPLACE" if self.replace else "INSERT OR IGNORE"
+        self._conn.executemany(
+            f"{verb} INTO borrowers ({', '.join(map(_quote, names))}) VALUES ({', '.join('?' * len(names))})",
+            zip(*columns)
+        )
+        self.rows_written += len(df)
+
+    def close(self):
+        """Record the metadata, commit and (for a new database) move it into place"""
+        if self.columns is None:
+            raise ValueError("No rows were written")
+        rows = self._conn.execute("SELECT COUNT(*) FROM borrowers").fetchone()[0]
+        meta = {
+            'format': DATABASE_FORMAT,
+            'rows': rows,
+            'columns': self.columns,
+            'scoring': scoring.parameters(),
+            'created': time.time()
+        }
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [(key, json.dumps(value)) for key, value in meta.items()])
+        self._conn.execute("COMMIT")
+        self._conn.close()
+        if not self.append:
+            os.replace(self._write_path, self.path)
+        return rows
+
+    def abort(self):
+        self._conn.execute("ROLLBACK")
+        self._conn.close()
+        if not self.append and os.path.exists(self._write_path):
+            os.remove(self._write_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_database(chunks, path=DATABASE_FILE):
+    """Write a DataFrame or an iterable of DataFrame chunks to a new database"""
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    with DatabaseWriter(path) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+    return writer
+
+
+def _read_meta(conn):
+    meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+    if meta.get('format') != DATABASE_FORMAT:
+        raise ValueError(f"Unsupported database format {meta.get('format')}")
+    return meta
+
+
+class SqliteStore(CachedStore):
+    """Borrower table in a SQLite database written by DatabaseWriter
+
+    Only the hot-row caches live in memory. Each thread of each process
+    gets its own read-only connection on first use (connections don't
+    survive a fork), and every query is a fixed SQL string, so sqlite3's
+    statement cache prepares it once per connection.
+    """
+
+    def __init__(self, path=DATABASE_FILE, max_cached=CACHE_SIZE):
+        super().__init__(max_cached)
+        if not exists(path):
+            raise FileNotFoundError(f"No database at {path}")
+        self.path = path
+        conn = self._open()
+        try:
+            meta = _read_meta(conn)
+            stored = [row[1] for row in conn.execute("PRAGMA table_info(borrowers)")]
+        finally:
+            conn.close()
+
+        self.columns = meta['columns']
+        self.score_columns = [col for col in scoring.SCORE_COLUMNS if col in stored]
+        if self.score_columns and meta.get('scoring') != scoring.parameters():
+            raise ValueError(f"Scores in {path} were computed with other scoring parameters; "
+                             f"rebuild it with python sqlite_store.py")
+        self._rows = meta['rows']
+        self._select_columns = self.columns + self.score_columns
+        self._select = f"SELECT {', '.join(map(_quote, self._select_columns))} FROM borrowers"
+        self._lookup = f"{self._select} WHERE member_id = ?"
+        self._lookup_many = f"{self._select} WHERE member_id IN ({', '.join('?' * LOOKUP_BATCH)})"
+        self._local = threading.local()
+
+    def _open(self, **kwargs):
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=32, **kwargs)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        return conn
+
+    def _connection(self):
+        """This thread's connection, reopened after a fork"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = self._open()
+            local.pid = os.getpid()
+        return local.conn
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def nbytes(self):
+        """Size of the database file (on disk, not in memory)"""
+        return os.path.getsize(self.path)
+
+    def _load_record(self, member_id):
+        try:
+            row = self._connection().execute(self._lookup, (member_id,)).fetchone()
+        except OverflowError:
+            # Larger than SQLite's 64-bit integers, so not a stored member_id
+            return None
+        return None if row is None else dict(zip(self._select_columns, row))
+
+    def _load_records(self, member_ids):
+        """One IN (...) query per LOOKUP_BATCH ids through the primary key"""
+        # Larger than SQLite's 64-bit integers can't be stored member_ids
+        wanted = [member_id for member_id in member_ids if INT64_MIN <= member_id <= INT64_MAX]
+        conn = self._connection()
+        records = {}
+        for start in range(0, len(wanted), LOOKUP_BATCH):
+            batch = wanted[start:start + LOOKUP_BATCH]
+            batch += [None] * (LOOKUP_BATCH - len(batch))
+            for row in conn.execute(self._lookup_many, batch):
+                record = dict(zip(self._select_columns, row))
+                records[record['member_id']] = record
+        return records
+
+    def iter_rows(self, filters=None, block_rows=10000):
+        """Yield (columns, rows) per block of block_rows, ordered by member_id
+
+        filters maps a label column (e.g. loan_status, risk_category) to
+        the labels to keep. Uses its own connection, so the generator can
+        be consumed from any thread.
+        """
+        clauses, params = [], []
+        for column, wanted in (filters or {}).items():
+            clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(wanted))})")
+            params += list(wanted)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._open(check_same_thread=False)
+        try:
+            cursor = conn.execute(f"{self._select}{where} ORDER BY member_id", params)
+            while True:
+                rows = cursor.fetchmany(block_rows)
+                if not rows:
+                    break
+                yield self._select_columns, rows
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # Convert an existing CSV chunk by chunk: python sqlite_store.py [borrowers.csv] [borrowers.sqlite]
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else 'borrowers.csv'
+    db_file = sys.argv[2] if len(sys.argv) > 2 else DATABASE_FILE
+    with pd.read_csv(csv_file, chunksize=WRITE_CHUNK, dtype={'loan_status': 'category'}) as reader:
+        writer = write_database(reader, db_file)
+    print(f"Saved {writer.rows_written} records from {csv_file} to {db_file}"
+          + (f" ({writer.rows_skipped} without member_id skipped)" if writer.rows_skipped else ""))
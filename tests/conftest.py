@@ -0,0 +1,26 @@
+# Shared setup for the API tests
+#   python -m pytest -q
+import logging
+import os
+import sys
+
+# Run against the repo's modules with the response cache off, so every
+# request reaches the code under test
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RESPONSE_CACHE_SIZE', '0')
+
+import pytest
+
+import app as api
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
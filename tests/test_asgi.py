@@ -0,0 +1,72 @@
+# ASGI entry point: Flask runs off the event loop, so a slow request must
+# not hold up other connections, and responses match the WSGI app's
+import asyncio
+import time
+
+import app as api
+import asgi
+
+
+def scope(method, path, body, query):
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]}
+
+
+async def request(method, path, body=b'', query=b''):
+    """(status, body) of one request through asgi.app"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope(method, path, body, query), receive, send)
+    return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+
+def test_responses_match_wsgi(client):
+    async def run():
+        return [
+            await request('GET', '/health'),
+            await request('POST', '/risk_score', b'{"fico_range_high": 700, "annual_inc": 50000}'),
+            await request('POST', '/get_data', b'{"member_id": "x"}'),
+            await request('GET', '/export', query=b'risk_category=High'),
+        ]
+    results = asyncio.run(run())
+    expected = [
+        client.get('/health'),
+        client.post('/risk_score', json={"fico_range_high": 700, "annual_inc": 50000}),
+        client.post('/get_data', json={"member_id": "x"}),
+        client.get('/export?risk_category=High'),
+    ]
+    assert [status for status, _ in results] == [response.status_code for response in expected]
+    # /health carries timings; compare the rest byte for byte
+    assert [body for _, body in results[1:]] == [response.get_data() for response in expected[1:]]
+
+
+def test_slow_request_does_not_block_others(monkeypatch):
+    wsgi_app = api.app.wsgi_app
+
+    def slow(environ, start_response):
+        if environ['PATH_INFO'] == '/slow':
+            time.sleep(1)
+        return wsgi_app(environ, start_response)
+
+    monkeypatch.setattr(api.app, 'wsgi_app', slow)
+
+    async def timed(method, path, delay):
+        await asyncio.sleep(delay)
+        status, _ = await request(method, path)
+        return status, time.perf_counter() - started
+
+    async def run():
+        # /slow starts first; /health must not wait for it to finish
+        return await asyncio.gather(timed('GET', '/slow', 0), timed('GET', '/health', 0.05))
+
+    started = time.perf_counter()
+    (_, slow_elapsed), (status, elapsed) = asyncio.run(run())
+    assert slow_elapsed >= 1
+    assert status == 200 and elapsed < 0.5
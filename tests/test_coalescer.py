@@ -0,0 +1,178 @@
+# Coalesced vs direct scoring: a request answered as part of a batch must
+# get exactly what it would have got on its own
+import asyncio
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import app as api
+import asgi
+import coalescer
+import sqlite_store
+from borrower_store import BorrowerStore
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'borrowers.csv')
+
+SCORE_ITEMS = [
+    (700.0, 50000.0), (812.5, 123456.78), (640.0, 0.0), (900.0, 1e9), (300.0, 0.0),
+    (float('nan'), 50000.0), (700.0, float('nan')), (float('inf'), 1.0), (float('-inf'), 1.0),
+    (700.0, float('inf')), (1e30, 50000.0), (579.0, 29999.99),
+]
+ECL_ITEMS = [
+    (10000.0, 25.5), (2500.75, 0.0), (0.0, 100.0), (1e300, 99.99), (12345.67, 33.333),
+]
+
+
+def typed(value):
+    """value with the type of every part, so 100 and 100.0 differ"""
+    if isinstance(value, tuple):
+        return tuple(typed(part) for part in value)
+    return type(value).__name__, repr(value)
+
+
+def submit_together(co, items):
+    """Submit every item from its own thread at once; results in item order"""
+    results = [None] * len(items)
+    barrier = threading.Barrier(len(items))
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = co.submit(items[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.parametrize("handler, single, items", [
+    (api._score_many, api._score_one, SCORE_ITEMS),
+    (api._ecl_many, api._ecl_one, ECL_ITEMS),
+], ids=["risk_score", "calc_ecl"])
+def test_batch_handler_matches_single(handler, single, items):
+    assert [typed(result) for result in handler(items)] == [typed(single(item)) for item in items]
+
+
+def test_coalesced_matches_direct():
+    co = coalescer.Coalescer('test', api._score_many, api._score_one, window=0.05)
+    results = submit_together(co, SCORE_ITEMS)
+    assert [typed(result) for result in results] == [typed(api._score_one(item)) for item in SCORE_ITEMS]
+    assert co.stats()['batches'] < len(SCORE_ITEMS)
+
+
+def test_failed_batch_isolates_items():
+    def handler(items):
+        if any(item < 0 for item in items):
+            raise ValueError("negative")
+        return [item * 2 for item in items]
+
+    def single(item):
+        if item < 0:
+            raise ValueError("negative")
+        return item * 2
+
+    co = coalescer.Coalescer('test', handler, single, window=0.05)
+    results = submit_together(co, [1, -1, 3])
+    assert results[0] == 2 and results[2] == 6
+    assert isinstance(results[1], ValueError)
+
+
+def test_coalesced_route_matches_direct(client, monkeypatch):
+    bodies = [{"fico_range_high": fico, "annual_inc": income} for fico, income in SCORE_ITEMS
+              if fico == fico and income == income]
+    bodies += [{"fico_range_high": "nan", "annual_inc": 1}, {"fico_range_high": 700, "annual_inc": "inf"}]
+    direct = [client.post('/risk_score', json=body).get_data() for body in bodies]
+
+    monkeypatch.setitem(api.coalescers, 'risk_score', coalescer.Coalescer(
+        'risk_score', api._score_many, api._score_one, window=0.05))
+    responses = [None] * len(bodies)
+    barrier = threading.Barrier(len(bodies))
+
+    def call(i):
+        barrier.wait()
+        responses[i] = api.app.test_client().post('/risk_score', json=bodies[i]).get_data()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(bodies))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert responses == direct
+    assert api.coalescers['risk_score'].stats()['batches'] < len(bodies)
+
+
+def lookup_stores(tmp_path):
+    df = pd.read_csv(CSV_FILE, dtype={'loan_status': 'category'})
+    path = str(tmp_path / 'borrowers.sqlite')
+    sqlite_store.write_database(df, path)
+    return {
+        'dict_index': BorrowerStore.from_frame(df),
+        'sorted_index': BorrowerStore.from_frame(df, shared=True),
+        'sqlite': sqlite_store.SqliteStore(path),
+    }
+
+
+@pytest.mark.parametrize("backend", ['dict_index', 'sorted_index', 'sqlite'])
+def test_lookup_many_matches_single(backend, tmp_path):
+    store = lookup_stores(tmp_path)[backend]
+    ids = pd.read_csv(CSV_FILE, usecols=['member_id'])['member_id'].tolist()[:150]
+    ids += [ids[0], ids[5], 0, -1, 2 ** 63, -2 ** 63 - 1, 10 ** 30]
+    # Some bodies cached already, the rest loaded in one pass
+    api._lookup_one((store, ids[3]))
+    batched = api._lookup_many([(store, member_id) for member_id in ids])
+    fresh = lookup_stores(tmp_path)[backend]
+    assert batched == [api._lookup_one((fresh, member_id)) for member_id in ids]
+    assert sum(body is None for body in batched) == 5
+
+
+def test_submit_on_event_loop_runs_directly():
+    co = coalescer.Coalescer('test', api._score_many, api._score_one, window=0.5)
+
+    async def run():
+        started = time.perf_counter()
+        return co.submit(SCORE_ITEMS[0]), time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+    assert typed(result) == typed(api._score_one(SCORE_ITEMS[0]))
+    assert elapsed < 0.25 and co.stats()['batches'] == 0
+
+
+def test_asgi_requests_coalesce(monkeypatch):
+    # asgi.py runs handlers on its thread pool, off the loop, so batches form
+    co = coalescer.Coalescer('risk_score', api._score_many, api._score_one, window=0.05)
+    monkeypatch.setitem(api.coalescers, 'risk_score', co)
+    bodies = [('{"fico_range_high": %d, "annual_inc": 50000}' % fico).encode() for fico in range(600, 616)]
+
+    async def post(body):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.app({'type': 'http', 'method': 'POST', 'path': '/risk_score', 'query_string': b'',
+                        'headers': [(b'content-type', b'application/json'),
+                                    (b'content-length', str(len(body)).encode())]}, receive, send)
+        return b''.join(message.get('body', b'') for message in sent[1:])
+
+    async def run():
+        return await asyncio.gather(*(post(body) for body in bodies))
+
+    responses = asyncio.run(run())
+    assert co.stats()['items'] == len(bodies) and co.stats()['batches'] < len(bodies)
+    client = api.app.test_client()
+    monkeypatch.setitem(api.coalescers, 'risk_score', coalescer.Coalescer(
+        'risk_score', api._score_many, api._score_one))
+    assert responses == [client.post('/risk_score', data=body, content_type='application/json').get_data()
+                         for body in bodies]
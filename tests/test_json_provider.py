@@ -0,0 +1,88 @@
+# orjson vs standard library output: FastJSONProvider must write the same
+# JSON with either backend, and request bodies must parse the same way
+import json
+
+import numpy as np
+import pytest
+
+import app as api
+import json_provider
+
+pytestmark = pytest.mark.skipif(json_provider.orjson is None, reason="orjson is not installed")
+
+PAYLOADS = [
+    {"member_id": 68407277, "annual_inc": 55000.5, "loan_status": "Fully Paid", "found": True},
+    {"risk_score": 100, "risk_category": "High"},
+    {"risk_score": 0.1 + 0.2, "tiny": 5e-324, "big": 1.7976931348623157e308, "neg_zero": -0.0},
+    # NaN and infinities are written as null
+    {"nan": float('nan'), "inf": float('inf'), "ninf": float('-inf'), "nested": [[float('nan')], {"x": float('inf')}]},
+    # numpy scalars and arrays are written as plain numbers
+    {"i64": np.int64(2 ** 62), "u8": np.uint8(255), "f32": np.float32(0.5), "f64": np.float64('nan'),
+     "bool": np.bool_(True), "array": np.arange(3), "matrix": np.array([[1.5, np.nan], [np.inf, 2.0]])},
+    # Beyond 64 bits: orjson refuses, the stdlib fallback writes them
+    {"huge": 10 ** 30, "min_minus_one": -2 ** 63 - 1, "max_u64_plus_one": 2 ** 64},
+    {1: "int key", 2: "sorted"},
+    {"b": {"z": 1, "a": [None, True, False]}, "a": []},
+    {"text": "naïve café ✓", "quote": "\"\\\n\t"},
+    [1, "two", None, 3.5],
+]
+
+
+def provider(backend):
+    fast = json_provider.FastJSONProvider(api.app)
+    fast.backend = backend
+    return fast
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_dumps_matches_stdlib(payload):
+    fast, slow = provider('orjson').dumps(payload), provider('json').dumps(payload)
+    # orjson writes non-ASCII as UTF-8 rather than \u escapes; the values are the same
+    assert json.loads(fast) == json.loads(slow)
+    if all(ord(ch) < 128 for ch in fast):
+        assert fast == slow
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_encode_round_trip(payload):
+    body = provider('orjson').encode(payload)
+    assert body.endswith(b"\n")
+    assert json.loads(body) == json.loads(provider('json').encode(payload))
+    # Parsing our own output gives back the payload, NaN and infinities as None
+    assert json.loads(body) == json.loads(json.dumps(json_provider._finite(payload), default=json_provider._default))
+
+
+def test_kwargs_use_stdlib():
+    assert provider('orjson').dumps({"b": 1, "a": 2}, indent=2) == '{\n  "a": 2,\n  "b": 1\n}'
+
+
+@pytest.mark.parametrize("raw, status", [
+    ('{"member_id": 1e30}', 200),
+    ('{"member_id": %d}' % 10 ** 30, 200),
+    ('{"member_id": -9223372036854775809}', 200),
+    ('{"member_id": NaN}', 400),
+    ('{"member_id": "abc"}', 400),
+])
+def test_request_bodies_parse_like_stdlib(client, raw, status):
+    # Bodies beyond orjson's limits (big ints, NaN) still reach validation
+    response = client.post('/get_data', data=raw, content_type='application/json')
+    assert response.status_code == status
+    if status == 200:
+        assert response.get_json()["found"] is False
+
+
+def test_responses_match_across_backends(client, monkeypatch):
+    ids = [int(member_id) for member_id, _ in zip(api.store.array('member_id'), range(20))]
+    requests = [('/get_data', {"member_id": member_id}) for member_id in ids]
+    requests += [('/assess', {"member_id": member_id}) for member_id in ids[:5]]
+    requests += [('/risk_score', {"fico_range_high": "nan", "annual_inc": 1}),
+                 ('/calc_ecl', {"loan_amnt": "inf", "risk_score": 5}),
+                 ('/get_data/batch', {"member_ids": ids + [10 ** 30]})]
+
+    def responses(backend):
+        monkeypatch.setattr(api.app, 'json', provider(backend))
+        out = [client.post(path, json=body).get_data() for path, body in requests]
+        return out + [client.get('/portfolio_summary?top_n=3').get_data(), client.get('/export').get_data()]
+
+    fast = responses('orjson')
+    assert fast == responses('json')
@@ -0,0 +1,50 @@
+# Prebuilt vs in-process sort orders: a snapshot's memory-mapped /query
+# indexes must answer every query like ones sorted in the worker
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import query_index
+import snapshot
+from borrower_store import BorrowerStore
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(7)
+    n = 5000
+    df = pd.DataFrame({
+        'member_id': np.arange(n) * 3 + 1,
+        'fico_range_high': rng.integers(300, 851, n),
+        'annual_inc': rng.integers(1, 300, n) * 1000.0,
+        'loan_amnt': rng.integers(1, 40, n) * 500.0,
+    })
+    df.loc[::97, 'annual_inc'] = np.nan
+    return df
+
+
+def test_snapshot_indexes_are_memory_mapped(frame, tmp_path):
+    store = snapshot.load_store(snapshot.write_snapshot(frame, str(tmp_path / 'snap')))
+    index = query_index.QueryIndex(store)
+    assert sorted(store.sort_indexes) == sorted(query_index.INDEXED_COLUMNS)
+    for column in query_index.INDEXED_COLUMNS:
+        assert isinstance(index.index(column).order, np.memmap)
+        assert isinstance(index.index(column).values, np.memmap)
+
+
+def test_prebuilt_matches_sorted(frame, tmp_path):
+    prebuilt = query_index.QueryIndex(snapshot.load_store(snapshot.write_snapshot(frame, str(tmp_path / 'snap'))))
+    built = query_index.QueryIndex(BorrowerStore.from_frame(frame, shared=True)).build()
+    queries = [{}, {'fico_range_high': {'gte': 580, 'lte': 620}}, {'annual_inc': {'gt': 250000}},
+               {'fico_range_high': {'eq': 700}, 'loan_amnt': {'lt': 5000}}, {'risk_score': {'gte': 60}}]
+    for filters, order_by, descending in itertools.product(queries, query_index.INDEXED_COLUMNS, (False, True)):
+        pages = []
+        for index in (prebuilt, built):
+            after, found = 0, []
+            while after is not None:
+                positions, after = index.search(filters, order_by, descending, 250, after)
+                found += positions.tolist()
+            pages.append(found)
+        assert pages[0] == pages[1], (filters, order_by, descending)
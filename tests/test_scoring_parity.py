@@ -0,0 +1,109 @@
+# Scalar vs batch scoring: /risk_score and /risk_score/batch must give the
+# same status, values and JSON types for every input, including the edges
+import json
+
+import pytest
+
+import app as api
+
+ITEMS = [
+    {"fico_range_high": 700, "annual_inc": 50000},
+    {"fico_range_high": 812.5, "annual_inc": 123456.78},
+    {"fico_range_high": "640", "annual_inc": "42000"},
+    # Clamped to the 0 and 100 bounds, which are written as ints
+    {"fico_range_high": 900, "annual_inc": 10 ** 9},
+    {"fico_range_high": 300, "annual_inc": 0},
+    {"fico_range_high": 0, "annual_inc": 0},
+    {"fico_range_high": 1e308, "annual_inc": 1},
+    # NaN scores as 100 / High
+    {"fico_range_high": "nan", "annual_inc": 50000},
+    {"fico_range_high": 700, "annual_inc": "NaN"},
+    {"fico_range_high": "inf", "annual_inc": 1},
+    {"fico_range_high": "-inf", "annual_inc": 1},
+    {"fico_range_high": 700, "annual_inc": "inf"},
+    {"fico_range_high": 10 ** 30, "annual_inc": 50000},
+    {"fico_range_high": True, "annual_inc": 50000},
+    # Rejected the same way by both
+    {"fico_range_high": 700, "annual_inc": -1},
+    {"fico_range_high": 700, "annual_inc": "-inf"},
+    {"fico_range_high": "abc", "annual_inc": 50000},
+    {"fico_range_high": None, "annual_inc": 50000},
+    {"fico_range_high": 700, "annual_inc": None},
+    {"fico_range_high": [700], "annual_inc": 50000},
+    {"fico_range_high": {"a": 1}, "annual_inc": 50000},
+    {"annual_inc": 50000},
+    {"fico_range_high": 700},
+]
+
+
+def scalar_result(client, item):
+    """(status, body) of /risk_score in the shape of a batch result"""
+    response = client.post('/risk_score', json=item)
+    return response.status_code, response.get_data(as_text=True).strip()
+
+
+def batch_result(result):
+    body = json.dumps(result, separators=(",", ":"), sort_keys=True)
+    return (400 if "error" in result else 200), body
+
+
+@pytest.mark.parametrize("item", ITEMS, ids=[json.dumps(item) for item in ITEMS])
+def test_single_item_batch_matches_scalar(client, item):
+    response = client.post('/risk_score/batch', json={"items": [item]})
+    assert response.status_code == 200
+    assert batch_result(response.get_json()["results"][0]) == scalar_result(client, item)
+
+
+def test_mixed_batch_matches_scalar(client):
+    # One batch holding every case: failures must not leak into neighbours
+    response = client.post('/risk_score/batch', json={"items": ITEMS})
+    body = response.get_json()
+    assert body["count"] == len(ITEMS)
+    for item, result in zip(ITEMS, body["results"]):
+        assert batch_result(result) == scalar_result(client, item), item
+    assert body["error_count"] == sum(scalar_result(client, item)[0] != 200 for item in ITEMS)
+
+
+def test_bounds_are_ints(client):
+    low = client.post('/risk_score', json={"fico_range_high": 900, "annual_inc": 10 ** 9})
+    high = client.post('/risk_score', json={"fico_range_high": "nan", "annual_inc": 1})
+    assert low.get_data(as_text=True).strip() == '{"risk_category":"Low","risk_score":0}'
+    assert high.get_data(as_text=True).strip() == '{"risk_category":"High","risk_score":100}'
+
+
+ECL_ITEMS = [
+    {"loan_amnt": 10000, "risk_score": 25.5},
+    {"loan_amnt": "2500.75", "risk_score": "0"},
+    {"loan_amnt": 0, "risk_score": 100},
+    {"loan_amnt": 1e300, "risk_score": 99.99},
+    {"loan_amnt": "nan", "risk_score": 50},
+    {"loan_amnt": 10000, "risk_score": "nan"},
+    {"loan_amnt": "inf", "risk_score": 50},
+    {"loan_amnt": 10 ** 30, "risk_score": 1},
+    {"loan_amnt": -1, "risk_score": 50},
+    {"loan_amnt": 10000, "risk_score": 100.01},
+    {"loan_amnt": 10000, "risk_score": -0.01},
+    {"loan_amnt": None, "risk_score": 50},
+    {"loan_amnt": "x", "risk_score": 50},
+    {"risk_score": 50},
+    {"loan_amnt": 10000},
+]
+
+
+@pytest.mark.parametrize("item", ECL_ITEMS, ids=[json.dumps(item) for item in ECL_ITEMS])
+def test_ecl_batch_matches_scalar(client, item):
+    scalar = client.post('/calc_ecl', json=item)
+    response = client.post('/calc_ecl/batch', json={"items": [item]})
+    assert batch_result(response.get_json()["results"][0]) == (
+        scalar.status_code, scalar.get_data(as_text=True).strip())
+
+
+def test_get_data_batch_matches_scalar(client):
+    borrowers = api.store
+    ids = [int(member_id) for member_id, _ in zip(borrowers.array('member_id'), range(50))]
+    ids += [0, -1, 2 ** 63, 10 ** 30]
+    response = client.post('/get_data/batch', json={"member_ids": ids})
+    for member_id, result in zip(ids, response.get_json()["results"]):
+        scalar = client.post('/get_data', json={"member_id": member_id})
+        assert scalar.status_code == 200
+        assert scalar.get_json() == result
@@ -0,0 +1,90 @@
+# SQLite vs in-memory storage: both backends must answer every lookup and
+# aggregate with the same values and JSON types
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as api
+import sqlite_store
+from borrower_store import BorrowerStore
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_frames():
+    yield 'borrowers_csv', pd.read_csv(os.path.join(REPO, 'borrowers.csv'), dtype={'loan_status': 'category'})
+    yield 'ints', pd.DataFrame({
+        'member_id': [101, 102, 103, 2 ** 40, 105],
+        'annual_inc': [55000, 120000, 35000, 0, 10 ** 9],
+        'fico_range_high': [680, 790, 550, 300, 850],
+        'loan_amnt': [10000, 25000, 5000, 1, 40000],
+    })
+    yield 'floats_and_gaps', pd.DataFrame({
+        'member_id': [1, 2, 3, 4, 5, 6],
+        'annual_inc': [55000.5, np.nan, 0.0, 1e7, 42000.0, 80000.0],
+        'fico_range_high': [680.5, 700.0, np.nan, 812.0, 579.0, 640.0],
+        'loan_amnt': [10000.0, 2500.25, 5000.0, np.nan, 12000.0, 1.0],
+        'loan_status': pd.Categorical(['Fully Paid', None, 'Charged Off', 'Current', 'Fully Paid', None]),
+    })
+
+
+@pytest.fixture(params=list(sample_frames()), ids=lambda case: case[0])
+def stores(request, tmp_path):
+    """(in-memory store, SQLite store) built from the same rows"""
+    df = request.param[1]
+    memory = BorrowerStore.from_frame(df)
+    path = str(tmp_path / 'borrowers.sqlite')
+    sqlite_store.write_database(df, path)
+    return memory, sqlite_store.SqliteStore(path)
+
+
+def typed(record):
+    """record with each value's type, so 709 and 709.0 differ"""
+    if record is None:
+        return None
+    return [(key, type(value).__name__, repr(value)) for key, value in record.items()]
+
+
+def test_records_match(stores):
+    memory, database = stores
+    assert len(memory) == len(database)
+    assert memory.columns == database.columns and memory.score_columns == database.score_columns
+    ids = [int(member_id) for member_id in memory.array('member_id')]
+    for member_id in ids + [0, -1, 2 ** 63, 10 ** 30]:
+        assert typed(database.get(member_id)) == typed(memory.get(member_id)), member_id
+
+
+@pytest.mark.parametrize("filters", [None, {'risk_category': ['High']}, {'risk_category': ['Low', 'Medium']}])
+def test_rows_match(stores, filters):
+    memory, database = stores
+
+    def rows(store):
+        out = []
+        for columns, block in store.iter_rows(filters, block_rows=3):
+            out += [typed(dict(zip(columns, row))) for row in block]
+        return sorted(out, key=lambda row: int(row[0][2]))
+
+    assert rows(database) == rows(memory)
+
+
+def test_routes_match(stores, client, monkeypatch):
+    memory, database = stores
+    ids = [int(member_id) for member_id in memory.array('member_id')] + [0, 10 ** 30]
+
+    def responses(store):
+        monkeypatch.setattr(api, 'store', store)
+        out = [client.post('/get_data', json={"member_id": member_id}).get_data() for member_id in ids]
+        out += [client.post('/assess', json={"member_id": member_id}).get_data() for member_id in ids]
+        out.append(client.post('/get_data/batch', json={"member_ids": ids}).get_data())
+        out.append(client.get('/portfolio_summary?top_n=3').get_data())
+        simulated = client.post('/simulate', json={"scenarios": 200}).get_json()
+        simulated.pop("elapsed_seconds")
+        out.append(simulated)
+        lines = client.get('/export').get_data(as_text=True).splitlines()
+        out.append(sorted(lines, key=lambda line: json.loads(line)['member_id']))
+        return out
+
+    assert responses(database) == responses(memory)